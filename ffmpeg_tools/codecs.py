@@ -1,5 +1,6 @@
 import enum
-from typing import Any, Dict, List, Optional
+import functools
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 
 from . import exceptions
 from . import formats
@@ -7,86 +8,107 @@ from . import frame_rate
 from . import utils
 
 
-DATA_STREAM_WHITELIST = [
-    'bin_data'
-]
+DATA_STREAM_WHITELIST: FrozenSet[str] = frozenset({
+    'bin_data',
+})
 
 
 class VideoCodec(enum.Enum):
-    AV1 = "av1"              # Alliance for Open Media AV1
-    FLV1 = "flv1"            # FLV / Sorenson Spark / Sorenson H.263 (Flash Video)
-    H_263 = "h263"           # H.263 / H.263-1996,
-                             # H.263+ / H.263-1998 / H.263 version 2
-    H_264 = "h264"           # H.264 / AVC / MPEG-4 AVC / MPEG-4 part 10
-    H_265 = "h265"
-    HEVC = "hevc"            # H.265 / HEVC (High Efficiency Video Coding)
-    MJPEG = "mjpeg"          # Motion JPEG
-    MPEG_1 = "mpeg1video"    # MPEG-1 video
-    MPEG_2 = "mpeg2video"    # MPEG-2 video
-    MPEG_4 = "mpeg4"         # MPEG-4 part 2
-    MSMPEG4V2 = "msmpeg4v2"  # MPEG-4 part 2 Microsoft variant version 2
-    THEORA = "theora"        # Theora
-    VP8 = "vp8"              # On2 VP8
-    VP9 = "vp9"              # Google VP9
-    WMV1 = "wmv1"            # Windows Media Video 7
-    WMV2 = "wmv2"            # Windows Media Video 8
-    WMV3 = "wmv3"            # Windows Media Video 9
-
+    # Each member is a (codec name, encoder name) pair. The codec name is the
+    # value of the member. FFMPEG needs encoder name, instead of codec name
+    # as transcoding parameter. None means that we can't encode the codec.
+    AV1 = ("av1", None)                       # Alliance for Open Media AV1
+                                              # (libaom-av1 is still experimental)
+    FLV1 = ("flv1", "flv")                    # FLV / Sorenson Spark / Sorenson H.263 (Flash Video)
+    H_263 = ("h263", "h263")                  # H.263 / H.263-1996,
+                                              # H.263+ / H.263-1998 / H.263 version 2
+    H_264 = ("h264", "libx264")               # H.264 / AVC / MPEG-4 AVC / MPEG-4 part 10
+    H_265 = ("h265", "libx265")               # Alias for HEVC. See _VIDEO_CODEC_ALIASES.
+    HEVC = ("hevc", "libx265")                # H.265 / HEVC (High Efficiency Video Coding)
+    MJPEG = ("mjpeg", "mjpeg")                # Motion JPEG; alternatives: mjpeg_vaapi
+    MPEG_1 = ("mpeg1video", "mpeg1video")     # MPEG-1 video
+    MPEG_2 = ("mpeg2video", "mpeg2video")     # MPEG-2 video
+    MPEG_4 = ("mpeg4", "libxvid")             # MPEG-4 part 2
+    MSMPEG4V2 = ("msmpeg4v2", "msmpeg4v2")    # MPEG-4 part 2 Microsoft variant version 2
+    THEORA = ("theora", "libtheora")          # Theora
+    VP8 = ("vp8", "libvpx")                   # On2 VP8; alternatives: vp8_vaapi, vp8_v4l2m2m
+    VP9 = ("vp9", "libvpx-vp9")               # Google VP9; alternatives: vp9_vaapi
+    WMV1 = ("wmv1", "wmv1")                   # Windows Media Video 7
+    WMV2 = ("wmv2", "wmv2")                   # Windows Media Video 8
+    WMV3 = ("wmv3", None)                     # Windows Media Video 9
+
+    def __new__(cls, value: str, encoder: Optional[str]):
+        codec = object.__new__(cls)
+        codec._value_ = value
+        codec._encoder = encoder
+        return codec
 
     # Normally enum throws ValueError, when initialization value is invalid.
     # We want to return more meaningful exception. This function is called by
     # enum when all conversion options failed.
     @classmethod
     def _missing_(cls, value):
-        raise exceptions.UnsupportedVideoCodec(value, "")
+        raise exceptions.UnsupportedVideoCodec(value)
 
     @staticmethod
     def from_name(name: str) -> 'VideoCodec':
-        return VideoCodec(name)
+        # Codec identifiers are ffmpeg's codec names, which are always lowercase.
+        return VideoCodec(name.strip().lower())
+
+    @staticmethod
+    def from_encoder(encoder: str) -> Optional['VideoCodec']:
+        return _VIDEO_CODECS_BY_ENCODER.get(encoder)
 
-    # FFMPEG needs encoder name, instead of codec name as transcoding parameter.
-    # If list doesn't contain encoder we assume that we can pass codec name.
     def get_encoder(self) -> Optional[str]:
-        return _VIDEO_ENCODERS.get(self.value, self.value)
+        return self._encoder
 
-    def get_supported_conversions(self) -> List[str]:
-        return _VIDEO_SUPPORTED_CONVERSIONS.get(self.value, [])
+    def get_supported_conversions(self) -> FrozenSet[str]:
+        return _VIDEO_SUPPORTED_CONVERSIONS.get(self.value, _NO_CONVERSIONS)
 
     def can_convert(self, video_codec: str) -> bool:
         return video_codec in self.get_supported_conversions()
 
 
 class AudioCodec(enum.Enum):
-    AAC = "aac"        # AAC (Advanced Audio Coding)
-    AC3 = "ac3"        # ATSC A/52A (AC-3)
-    AMR_NB = "amr_nb"  # AMR-NB (Adaptive Multi-Rate NarrowBand)
-    MP2 = "mp2"        # MP2 (MPEG audio layer 2)
-    MP3 = "mp3"        # MP3 (MPEG audio layer 3)
-    OPUS = "opus"      # Opus (Opus Interactive Audio Codec)
-    PCM_U8 = "pcm_u8"  # PCM unsigned 8-bit
-    WMAV2 = "wmav2"    # Windows Media Audio 2
-    WMAPRO = "wmapro"  # Windows Media Audio 9 Professional
-    VORBIS = "vorbis"  # Vorbis
-
+    # Each member is a (codec name, encoder name) pair. See VideoCodec.
+    AAC = ("aac", "aac")                      # AAC (Advanced Audio Coding)
+    AC3 = ("ac3", "ac3")                      # ATSC A/52A (AC-3)
+    AMR_NB = ("amr_nb", "libopencore_amrnb")  # AMR-NB (Adaptive Multi-Rate NarrowBand)
+    MP2 = ("mp2", "mp2")                      # MP2 (MPEG audio layer 2); alternatives: mp2fixed
+    MP3 = ("mp3", "libmp3lame")               # MP3 (MPEG audio layer 3)
+    OPUS = ("opus", "libopus")                # Opus (Opus Interactive Audio Codec)
+    PCM_U8 = ("pcm_u8", "pcm_u8")             # PCM unsigned 8-bit
+    WMAV2 = ("wmav2", "wmav2")                # Windows Media Audio 2
+    WMAPRO = ("wmapro", None)                 # Windows Media Audio 9 Professional
+    VORBIS = ("vorbis", "libvorbis")          # Vorbis
+
+    def __new__(cls, value: str, encoder: Optional[str]):
+        codec = object.__new__(cls)
+        codec._value_ = value
+        codec._encoder = encoder
+        return codec
 
     # Normally enum throws ValueError, when initialization value is invalid.
     # We want to return more meaningful exception. This function is called by
     # enum when all conversion options failed.
     @classmethod
     def _missing_(cls, value):
-        raise exceptions.UnsupportedAudioCodec(value, "")
+        raise exceptions.UnsupportedAudioCodec(value)
 
     @staticmethod
     def from_name(name: str) -> 'AudioCodec':
-        return AudioCodec(name)
+        # Codec identifiers are ffmpeg's codec names, which are always lowercase.
+        return AudioCodec(name.strip().lower())
+
+    @staticmethod
+    def from_encoder(encoder: str) -> Optional['AudioCodec']:
+        return _AUDIO_CODECS_BY_ENCODER.get(encoder)
 
-    # FFMPEG needs encoder name, instead of codec name as transcoding parameter.
-    # If list doesn't contain encoder we assume that we can pass codec name.
     def get_encoder(self) -> Optional[str]:
-        return _AUDIO_ENCODERS.get(self.value, self.value)
+        return self._encoder
 
-    def get_supported_conversions(self) -> List[str]:
-        return _AUDIO_SUPPORTED_CONVERSIONS.get(self.value, [])
+    def get_supported_conversions(self) -> FrozenSet[str]:
+        return _AUDIO_SUPPORTED_CONVERSIONS.get(self.value, _NO_CONVERSIONS)
 
     def can_convert(self, audio_codec: str) -> bool:
         return audio_codec in self.get_supported_conversions()
@@ -121,74 +143,95 @@ class SubtitleCodec(enum.Enum):
 
     @classmethod
     def _missing_(cls, value):
-        raise exceptions.UnsupportedSubtitleCodec(value, "")
+        raise exceptions.UnsupportedSubtitleCodec(value)
 
     @staticmethod
     def from_name(name: str) -> 'SubtitleCodec':
-        return SubtitleCodec(name)
+        # Codec identifiers are ffmpeg's codec names, which are always lowercase.
+        return SubtitleCodec(name.strip().lower())
 
-    def get_supported_conversions(self) -> List[str]:
-        return _SUBTITLE_SUPPORTED_CONVERSIONS.get(self.value, [])
+    def get_supported_conversions(self) -> FrozenSet[str]:
+        return _SUBTITLE_SUPPORTED_CONVERSIONS.get(self.value, _NO_CONVERSIONS)
 
     def can_convert(self, subtitle_codec: str) -> bool:
         return subtitle_codec in self.get_supported_conversions()
 
     def select_conversion_for_container(self, target_container: str) -> Optional[str]:
-        if not formats.is_supported(target_container):
-            return None
-
-        supported_codecs = (
-            set(self.get_supported_conversions()) &
-            set(formats.Container(target_container).get_supported_subtitle_codecs())
-        )
+        # Returns an empty list for unknown containers so there's no need to
+        # validate the container and construct the enum separately.
+        container_codecs = formats.list_supported_subtitle_codecs(target_container)
+        conversions = self.get_supported_conversions()
+        supported_codecs = {codec for codec in container_codecs if codec in conversions}
 
         if len(supported_codecs) == 0:
             return None
 
-        return sorted(supported_codecs)[0]
-
-
-_VIDEO_ENCODERS = {
-    "av1": None,                    # libaom-av1 is still experimental
-    "flv1": "flv",
-    "h263": "h263",
-    "h264": "libx264",
-    "h265": "libx265",
-    "hevc": "libx265",
-    "mjpeg": "mjpeg",               # Alternatives: mjpeg_vaapi
-    "mpeg1video": "mpeg1video",
-    "mpeg2video": "mpeg2video",
-    "mpeg4": "libxvid",
-    "msmpeg4v2": "msmpeg4v2",
-    "theora": "libtheora",
-    "vp8": "libvpx",                # Alternatives: vp8_vaapi, vp8_v4l2m2m
-    "vp9": "libvpx-vp9",            # Alternatives: vp9_vaapi
-    "wmv1": "wmv1",
-    "wmv2": "wmv2",
-    "wmv3": None,
+        return min(supported_codecs)
+
+
+# Lookup tables mapping codec names to enum members. Looking a codec up here
+# is cheaper than constructing an enum member and catching the exception raised
+# for invalid values. They also serve as the sets of valid codec names.
+_VIDEO_CODECS_BY_NAME: Dict[str, VideoCodec] = {codec.value: codec for codec in VideoCodec}
+_AUDIO_CODECS_BY_NAME: Dict[str, AudioCodec] = {codec.value: codec for codec in AudioCodec}
+_SUBTITLE_CODECS_BY_NAME: Dict[str, SubtitleCodec] = {codec.value: codec for codec in SubtitleCodec}
+
+
+# "hevc" is the name ffmpeg uses for H.265 but we accept "h265" as well.
+# An alias shares table rows with the codec it refers to so that the two
+# cannot accidentally diverge. Aliased rows are added with _add_video_aliases().
+_VIDEO_CODEC_ALIASES = {
+    "h265": "hevc",
 }
 
-_AUDIO_ENCODERS = {
-    "aac": "aac",
-    "ac3": "ac3",
-    "amr_nb": "libopencore_amrnb",
-    "mp2": "mp2",                   # Alternatives: mp2fixed
-    "mp3": "libmp3lame",
-    "opus": "libopus",
-    "pcm_u8": "pcm_u8",
-    "wmapro": None,
-    "wmav2": "wmav2",
-    "vorbis": "libvorbis",
+
+def _add_video_aliases(table: Dict[str, Any]) -> Dict[str, Any]:
+    table.update({
+        alias: table[codec]
+        for alias, codec in _VIDEO_CODEC_ALIASES.items()
+        if codec in table
+    })
+    return table
+
+
+# Reverse lookup tables used by from_encoder(). Aliases are skipped so that
+# an encoder always maps back to the canonical codec.
+_VIDEO_CODECS_BY_ENCODER = {
+    codec.get_encoder(): codec
+    for codec in VideoCodec
+    if codec.get_encoder() is not None and codec.value not in _VIDEO_CODEC_ALIASES
 }
+_AUDIO_CODECS_BY_ENCODER = {
+    codec.get_encoder(): codec
+    for codec in AudioCodec
+    if codec.get_encoder() is not None
+}
+
+
+# Returned for codecs that have no entry in a conversion table. Shared and
+# immutable so that a miss does not allocate anything.
+_NO_CONVERSIONS: FrozenSet[str] = frozenset()
+
+
+def _freeze_conversion_table(table: Dict[str, List[str]]) -> Dict[str, FrozenSet[str]]:
+    # Conversions are stored as frozensets so that can_convert() is a single hash
+    # lookup. Most rows in the tables are identical so instead of keeping
+    # a separate copy for each codec we make them all share a single object.
+    unique_rows: Dict[FrozenSet[str], FrozenSet[str]] = {}
+    frozen_table = {}
+    for codec, conversions in table.items():
+        row = frozenset(conversions)
+        frozen_table[codec] = unique_rows.setdefault(row, row)
 
+    return frozen_table
 
-_VIDEO_SUPPORTED_CONVERSIONS = {
+
+_VIDEO_SUPPORTED_CONVERSIONS = _freeze_conversion_table(_add_video_aliases({
     #              "av1", "flv1", "h263", "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4", "msmpeg4v2", "theora", "vp8", "vp9", "wmv1", "wmv2", "wmv3"
     "av1":        [                                                                                                                                                        ],
     "flv1":       [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
     "h263":       [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
     "h264":       [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
-    "h265":       [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
     "hevc":       [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
     "mjpeg":      [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
     "mpeg1video": [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
@@ -201,9 +244,9 @@ _VIDEO_SUPPORTED_CONVERSIONS = {
     "wmv1":       [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
     "wmv2":       [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
     "wmv3":       [       "flv1",         "h264", "h265", "hevc", "mjpeg", "mpeg1video", "mpeg2video", "mpeg4",                        "vp8", "vp9", "wmv1", "wmv2"        ],
-}
+}))
 
-_AUDIO_SUPPORTED_CONVERSIONS = {
+_AUDIO_SUPPORTED_CONVERSIONS = _freeze_conversion_table({
     #          "aac", "ac3", "amr_nb", "mp2", "mp3", "opus", "pcm_u8", "wmapro", "wmav2", "vorbis"
     "aac":    ["aac", "ac3", "amr_nb", "mp2", "mp3", "opus", "pcm_u8",           "wmav2", "vorbis"],
     "ac3":    ["aac", "ac3", "amr_nb", "mp2", "mp3", "opus", "pcm_u8",           "wmav2", "vorbis"],
@@ -215,76 +258,135 @@ _AUDIO_SUPPORTED_CONVERSIONS = {
     "wmapro": ["aac", "ac3", "amr_nb", "mp2", "mp3", "opus", "pcm_u8",           "wmav2", "vorbis"],
     "wmav2":  ["aac", "ac3", "amr_nb", "mp2", "mp3", "opus", "pcm_u8",           "wmav2", "vorbis"],
     "vorbis": ["aac", "ac3", "amr_nb", "mp2", "mp3", "opus", "pcm_u8",           "wmav2", "vorbis"],
-}
+})
 
-_SUBTITLE_SUPPORTED_CONVERSIONS = {
+_SUBTITLE_SUPPORTED_CONVERSIONS = _freeze_conversion_table({
     'subrip':   ['subrip', 'ass', 'mov_text', 'webvtt'],
     'ass':      ['subrip', 'ass', 'mov_text', 'webvtt'],
     'mov_text': ['subrip', 'ass', 'mov_text', 'webvtt'],
     'webvtt':   ['subrip', 'ass', 'mov_text', 'webvtt'],
+})
+
+
+@functools.lru_cache(maxsize=None)
+def _sort_conversions(conversions: FrozenSet[str]) -> Tuple[str, ...]:
+    # Frozensets are great for membership tests but have no stable iteration
+    # order. The list_supported_*_conversions() functions return these sorted
+    # tuples instead. There are only a few distinct rows so each one gets
+    # sorted once and the tuple is shared by all codecs using that row.
+    return tuple(sorted(conversions))
+
+
+def _list_conversions(table: Dict[str, FrozenSet[str]], codec: str) -> Tuple[str, ...]:
+    # Reads the live row so that the result always agrees with
+    # get_supported_conversions().
+    return _sort_conversions(table.get(codec, _NO_CONVERSIONS))
+
+
+# Not aliased on purpose. Adding a row for hevc would change encoder output
+# for hevc targets, which so far have been transcoded without -crf.
+_PRESERVE_QUALITY_COMMAND: Dict[str, Tuple[str, ...]] = {
+    "h264" : ( "-crf", "22" ),
+    "h265" : ( "-crf", "22" ),
+    "vp8" : ( "-crf", "22", "-b:v", "0" ),
+    "vp9" : ( "-crf", "22", "-b:v", "0" )
 }
 
-_PRESERVE_QUALITY_COMMAND = {
-    "h264" : [ "-crf", "22" ],
-    "h265" : [ "-crf", "22" ],
-    "vp8" : [ "-crf", "22", "-b:v", "0" ],
-    "vp9" : [ "-crf", "22", "-b:v", "0" ]
+
+# Hardware encoders that can be requested instead of the default software
+# ones. All of them accept frames in system memory so the rest of the
+# transcoding command (e.g. the scaling filter) does not need to change.
+# VAAPI is not here because it needs frames uploaded to the device.
+_HARDWARE_VIDEO_ENCODERS: Dict[str, Dict[str, str]] = {
+    "nvenc": _add_video_aliases({"h264": "h264_nvenc", "hevc": "hevc_nvenc"}),
+    "qsv": _add_video_aliases({"h264": "h264_qsv", "hevc": "hevc_qsv"}),
+    "amf": _add_video_aliases({"h264": "h264_amf", "hevc": "hevc_amf"}),
 }
 
 
-def get_video_encoder(target_codec: str) -> Optional[str]:
-    # This will throw exception for unsupported codecs.
-    codec = VideoCodec(target_codec)
-    return codec.get_encoder()
+def is_valid_video_codec(codec: str) -> bool:
+    return codec in _VIDEO_CODECS_BY_NAME
+
+
+def is_valid_audio_codec(codec: str) -> bool:
+    return codec in _AUDIO_CODECS_BY_NAME
+
+
+def is_valid_subtitle_codec(codec: str) -> bool:
+    return codec in _SUBTITLE_CODECS_BY_NAME
+
+
+def find_subtitle_codec(codec: str) -> Optional[SubtitleCodec]:
+    return _SUBTITLE_CODECS_BY_NAME.get(codec)
+
+
+def get_video_encoder(target_codec: str, hardware_backend: Optional[str]=None) -> Optional[str]:
+    codec = _VIDEO_CODECS_BY_NAME.get(target_codec)
+    if codec is None:
+        raise exceptions.UnsupportedVideoCodec(target_codec)
 
+    if hardware_backend is None:
+        return codec.get_encoder()
 
-def preserve_quality_command(target_codec: str) -> List[str]:
+    if hardware_backend not in _HARDWARE_VIDEO_ENCODERS:
+        raise exceptions.InvalidArgument(f"Unsupported hardware encoder backend: {hardware_backend}")
+
+    if target_codec not in _HARDWARE_VIDEO_ENCODERS[hardware_backend]:
+        raise exceptions.MissingVideoEncoder(target_codec)
+
+    return _HARDWARE_VIDEO_ENCODERS[hardware_backend][target_codec]
+
+
+def preserve_quality_command(target_codec: str) -> Tuple[str, ...]:
     # TODO: Hack function to preserve video quality for some formats.
     # Create better and more generic solution in future.
-    return _PRESERVE_QUALITY_COMMAND.get(target_codec, [])
+    return _PRESERVE_QUALITY_COMMAND.get(target_codec, ())
 
 
 def get_audio_encoder(target_codec: str) -> Optional[str]:
-    # This will throw exception for unsupported codecs.
-    codec = AudioCodec(target_codec)
-    return codec.get_encoder()
-
-
-def list_supported_video_conversions(codec: str) -> List[str]:
-    if codec not in VideoCodec._value2member_map_:
-        return []
+    codec = _AUDIO_CODECS_BY_NAME.get(target_codec)
+    if codec is None:
+        raise exceptions.UnsupportedAudioCodec(target_codec)
 
-    return VideoCodec(codec).get_supported_conversions()
+    return codec.get_encoder()
 
 
-def list_supported_audio_conversions(codec: str) -> List[str]:
-    if codec not in AudioCodec._value2member_map_:
-        return []
+def list_supported_video_conversions(codec: str) -> Tuple[str, ...]:
+    return _list_conversions(_VIDEO_SUPPORTED_CONVERSIONS, codec)
 
-    return AudioCodec(codec).get_supported_conversions()
 
+def list_supported_audio_conversions(codec: str) -> Tuple[str, ...]:
+    return _list_conversions(_AUDIO_SUPPORTED_CONVERSIONS, codec)
 
-def list_supported_subtitle_conversions(codec: str) -> List[str]:
-    if codec not in SubtitleCodec._value2member_map_:
-        return []
 
-    return SubtitleCodec(codec).get_supported_conversions()
+def list_supported_subtitle_conversions(codec: str) -> Tuple[str, ...]:
+    return _list_conversions(_SUBTITLE_SUPPORTED_CONVERSIONS, codec)
 
 
 MAX_SUPPORTED_FRAME_RATE = {
     VideoCodec.MPEG_1.value: 60
 }
 
-FRAME_RATE_SUBSTITUTIONS = {
+
+def _normalize_frame_rate_substitutions(
+        table: Dict[str, Dict[frame_rate.FrameRate, frame_rate.FrameRate]],
+) -> Dict[str, Dict[frame_rate.FrameRate, frame_rate.FrameRate]]:
+    # Rules are looked up by normalized source frame rate so both sides are
+    # normalized here instead of requiring them to be written that way.
+    return {
+        codec: {
+            original.normalized(): substitute.normalized()
+            for original, substitute in rules.items()
+        }
+        for codec, rules in table.items()
+    }
+
+
+FRAME_RATE_SUBSTITUTIONS = _normalize_frame_rate_substitutions({
     VideoCodec.MPEG_2.value: {
         frame_rate.FrameRate(25, 2): frame_rate.FrameRate(12),
     }
-}
-assert all(
-    original == original.normalized() and substitute == substitute.normalized()
-    for codec, rules in FRAME_RATE_SUBSTITUTIONS.items()
-    for original, substitute in rules.items()
-)
+})
 
 
 _SUPPORTED_SAMPLE_RATES: Dict[str, utils.SparseRange] = {
@@ -305,7 +407,6 @@ _SUPPORTED_SAMPLE_RATES: Dict[str, utils.SparseRange] = {
     "wmav2":             utils.SparseRange({(2, 48000)}),
     "pcm_u8":            utils.SparseRange({(1, None)}),       # Tested up to 1000000 Hz. Likely works for any positive value.
 }
-assert (set(_AUDIO_ENCODERS.values()) - {None}).issubset(set(_SUPPORTED_SAMPLE_RATES))
 
 
 def is_supported_sample_rate(
@@ -314,9 +415,8 @@ def is_supported_sample_rate(
     encoder_info: Dict[str, Any]=None,
 ) -> bool:
 
-    try:
-        codec = AudioCodec(audio_codec)
-    except exceptions.UnsupportedAudioCodec:
+    codec = _AUDIO_CODECS_BY_NAME.get(audio_codec)
+    if codec is None:
         return False
 
     return codec.is_supported_sample_rate(sample_rate, encoder_info)
@@ -1,9 +1,17 @@
+import bisect
+import collections
+import concurrent.futures
+import contextlib
+import errno
+import functools
+import itertools
+import json
+import logging
 import os
 import re
 import subprocess
-import sys
-import json
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Tuple
 
 from . import codecs
 from . import exceptions
@@ -15,14 +23,28 @@ FFPROBE_COMMAND = "ffprobe"
 
 TMP_DIR = "/golem/work/tmp/"
 
+logger = logging.getLogger(__name__)
+
+# ffprobe output for recently probed files, keyed by path, size and
+# modification time. An ordered dict with a lock rather than lru_cache() so that
+# get_video_len() can use the metadata if it's there without probing on a miss.
+_METADATA_CACHE_SIZE = 128
+_metadata_cache: 'collections.OrderedDict[Tuple[str, int, int], str]' = collections.OrderedDict()
+_metadata_cache_lock = threading.Lock()
+
+# Errors os.link() fails with on filesystems that don't support hard links.
+_NO_HARD_LINK_ERRNOS = frozenset({errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP})
+
+_PSNR_REGEX = re.compile(r'PSNR')
+_SSIM_REGEX = re.compile(r'SSIM')
+
 
 def flatten_list(list_of_lists):
-    return [item for sublist in list_of_lists for item in sublist]
+    return list(itertools.chain.from_iterable(list_of_lists))
 
 
 def exec_cmd(cmd, file=None):
-    print("Executing command:")
-    print(cmd)
+    logger.debug("Executing command: %s", cmd)
 
     pc = subprocess.Popen(cmd, stdout=file, stderr=file)
 
@@ -31,11 +53,15 @@ def exec_cmd(cmd, file=None):
         raise exceptions.CommandFailed(cmd, ret)
 
 
-def exec_cmd_to_file(cmd, filepath):
-    # Ensure directory exists
+def _create_parent_directory(filepath):
+    # The path may have no directory component.
     filedir = os.path.dirname(filepath)
-    if not os.path.exists(filedir):
-        os.makedirs(filedir)
+    if filedir != '':
+        os.makedirs(filedir, exist_ok=True)
+
+
+def exec_cmd_to_file(cmd, filepath):
+    _create_parent_directory(filepath)
 
     # Execute command and send results to file.
     with open(filepath, "w") as result_file:
@@ -43,11 +69,10 @@ def exec_cmd_to_file(cmd, filepath):
 
 
 def exec_cmd_to_string(cmd):
+    logger.debug("Executing command: %s", cmd)
 
-    print("Executing command:")
-    print(cmd)
-
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Nothing reads stderr so there's no point in buffering it in memory.
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
 
     if result.returncode != 0:
         raise exceptions.CommandFailed(cmd, result.returncode)
@@ -91,62 +116,96 @@ def extract_streams_command(input_file,
     :param container: Video container type for the output file.
     """
 
-    map_options = [
-        ["-map", f"0:{index}"]
-        for index in selected_streams
+    cmd = [
+        FFMPEG_COMMAND,
+        "-nostdin",
+        "-i", input_file,
     ]
-
-    cmd = (
-        [
-            FFMPEG_COMMAND,
-            "-nostdin",
-            "-i", input_file,
-        ] +
-        flatten_list(map_options) +
-        [
-            "-codec", "copy",
-        ] +
-        ([
-            "-f", container,
-        ] if container is not None else []) +
-        [
-            output_file,
-        ]
-    )
+    for index in selected_streams:
+        cmd.extend(["-map", f"0:{index}"])
+    cmd.extend([
+        "-codec", "copy",
+    ])
+    if container is not None:
+        cmd.extend(["-f", container])
+    cmd.append(output_file)
 
     return cmd
 
 
-def strip_suffix_from_segments_and_rename_files(output_list_file_path, suffix):
-    with open(output_list_file_path) as output_list_file:
-        file_paths = output_list_file.read().splitlines()
-
-    list_dir = os.path.dirname(output_list_file_path)
-
-    updated_file_list = []
-    for file_path in file_paths:
-        if not file_path.endswith(suffix):
-            # Should not happen if the list contains what we expect but we
-            # can't just assume that.
-            raise exceptions.InvalidCommandOutput(
-                f"Segment name does not match the expected pattern: {file_path}")
-
-        # Segment paths are relative to the location of the list file
-        full_file_path = os.path.join(list_dir, file_path)
+def _rename_without_overwriting(source, destination):
+    # os.rename() silently replaces an existing destination on POSIX and
+    # checking for it first is racy. Creating a hard link fails atomically
+    # if the destination exists.
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        if not os.path.samefile(source, destination):
+            raise
+
+        # Both names already point at the same file, e.g. because an earlier
+        # attempt was interrupted after creating the link. Just finish it.
+        os.unlink(source)
+    except FileNotFoundError:
+        if os.path.lexists(source) or not os.path.lexists(destination):
+            raise
+
+        # The file has already been renamed, e.g. by an earlier attempt that
+        # was interrupted before the segment list got updated.
+    except OSError as error:
+        if error.errno not in _NO_HARD_LINK_ERRNOS:
+            raise
+
+        # The filesystem does not support hard links. Fall back to a check
+        # that is good enough if nothing else is writing to the directory.
+        if os.path.lexists(destination):
+            raise FileExistsError(destination)
+        os.rename(source, destination)
+    else:
+        os.unlink(source)
 
-        new_path = file_path[:-len(suffix)]
-        full_new_path = full_file_path[:-len(suffix)]
-        if os.path.exists(new_path):
-            # This should never happen but is not impossible (filesystem is not
-            # under our sole control) so an assert is not appropriate.
-            raise exceptions.FileAlreadyExists(
-                f"Renaming '{file_path}' to '{new_path}' would overwrite the other file.")
 
-        os.rename(full_file_path, full_new_path)
-        updated_file_list.append(new_path)
+def strip_suffix_from_segments_and_rename_files(output_list_file_path, suffix):
+    list_dir = os.path.dirname(output_list_file_path)
 
-    with open(output_list_file_path, 'w') as output_list_file:
-        output_list_file.write("\n".join(updated_file_list))
+    # The updated list is written to a temporary file as we go and then
+    # replaces the original one so that we don't have to hold the whole
+    # list in memory.
+    updated_list_file_path = output_list_file_path + '.tmp'
+    with open(output_list_file_path) as output_list_file:
+        try:
+            with open(updated_list_file_path, 'w') as updated_list_file:
+                separator = ""
+                for line in output_list_file:
+                    file_path = line.rstrip('\r\n')
+                    if not file_path.endswith(suffix):
+                        # Should not happen if the list contains what we expect but we
+                        # can't just assume that.
+                        raise exceptions.InvalidCommandOutput(
+                            f"Segment name does not match the expected pattern: {file_path}")
+
+                    # Segment paths are relative to the location of the list file
+                    full_file_path = os.path.join(list_dir, file_path)
+
+                    new_path = file_path[:-len(suffix)]
+                    full_new_path = full_file_path[:-len(suffix)]
+                    try:
+                        _rename_without_overwriting(full_file_path, full_new_path)
+                    except FileExistsError:
+                        # This should never happen but is not impossible (filesystem is not
+                        # under our sole control) so an assert is not appropriate.
+                        raise exceptions.FileAlreadyExists(
+                            f"Renaming '{file_path}' to '{new_path}' would overwrite the other file.")
+
+                    updated_list_file.write(separator + new_path)
+                    separator = "\n"
+        except BaseException:
+            # The temporary file may not exist if it's the one we failed to open.
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(updated_list_file_path)
+            raise
+
+    os.replace(updated_list_file_path, output_list_file_path)
 
 
 def split_video(input_file, output_dir, split_len, container=None):
@@ -192,15 +251,16 @@ def split_video_command(input_file,
         "-i", input_file,
         "-codec", "copy",
         "-f", "segment",
-    ] + ([
-        "-segment_format", container,
-    ] if container is not None else []) + [
+    ]
+    if container is not None:
+        cmd.extend(["-segment_format", container])
+    cmd.extend([
         "-reset_timestamps", "1",
         "-segment_time", f"{segment_time}",
         "-segment_list_type", "flat",
         "-segment_list", output_list_file,
         f"{output_dir}/{input_basename}_%d{extension}",
-    ]
+    ])
 
     return cmd, output_list_file
 
@@ -210,7 +270,57 @@ def transcode_video(track, targs, output):
     exec_cmd(cmd)
 
 
+def _get_worker_count(max_workers):
+    # Each worker runs an ffmpeg or ffprobe process so there's no point in
+    # having more of them than CPUs.
+    if max_workers is None:
+        return os.cpu_count() or 1
+    return max_workers
+
+
+def transcode_videos(tracks, targs, outputs, max_workers=None):
+    """
+    Transcodes multiple videos (e.g. segments produced by split()) with the
+    same parameters. ffmpeg processes are run in parallel.
+
+    :param max_workers: Maximum number of ffmpeg processes running at the
+        same time. Defaults to the number of CPUs.
+    """
+    if len(tracks) != len(outputs):
+        raise exceptions.InvalidArgument(
+            f"Got {len(tracks)} tracks but {len(outputs)} output files. "
+            f"Each track needs exactly one output file.")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_get_worker_count(max_workers)) as executor:
+        # Consuming the results re-raises the first exception if any command failed.
+        list(executor.map(
+            lambda track, output: transcode_video(track, targs, output),
+            tracks,
+            outputs,
+        ))
+
+
 def transcode_video_command(track, output_file, targs):
+    """
+    Builds a ffmpeg command that transcodes a video stream extracted from
+    the input video.
+
+    :param track: File containing the video stream to transcode. Must exist.
+    :param output_file: File to put the transcoded stream in.
+    :param targs: Dictionary with transcoding parameters.
+        The following parameters are supported:
+            - `container`: format of the output file.
+            - `video`: dict with parameters for video stream transcoding.
+                Can include the following keys: `bitrate`, `codec`,
+                `hardware_encoder`. `hardware_encoder` selects the backend
+                used to encode the video (e.g. `nvenc`, `qsv`, `amf`) and
+                is only valid together with `codec`.
+            - `frame_rate`: target frame rate.
+            - `resolution`: target resolution as a [width, height] pair.
+            - `scaling_alg`: scaling algorithm passed to ffmpeg via `-sws_flags`.
+            - `threads`: number of threads ffmpeg may use.
+        Audio parameters are not accepted. Pass them to the 'replace' command instead.
+    """
     cmd = [
         FFMPEG_COMMAND,
         "-nostdin",
@@ -218,9 +328,9 @@ def transcode_video_command(track, output_file, targs):
         "-i",
         # input file
         "{}".format(track),
-    ] + ([
-        "-f", targs['container'],
-    ] if 'container' in targs else [])
+    ]
+    if 'container' in targs:
+        cmd.extend(["-f", targs['container']])
 
     if 'audio' in targs:
         # NOTE: It's not guaranteed that the file passed in here by the caller does not
@@ -234,12 +344,19 @@ def transcode_video_command(track, output_file, targs):
             "Audio parameters would have no effect when used here. "
             "You should pass them to the 'replace' command instead.")
 
+    if 'hardware_encoder' in targs.get('video', {}) and 'codec' not in targs['video']:
+        raise exceptions.InvalidArgument(
+            "A hardware encoder can only be used when the target video codec is specified.")
+
     # video settings
     if 'video' in targs and 'codec' in targs['video']:
         vcodec = targs['video']['codec']
+        hardware_backend = targs['video'].get('hardware_encoder')
         cmd.append("-c:v")
-        cmd.append(codecs.get_video_encoder(vcodec))
-        cmd = cmd + codecs.preserve_quality_command(vcodec)
+        cmd.append(codecs.get_video_encoder(vcodec, hardware_backend))
+        if hardware_backend is None:
+            # Quality settings are specific to the software encoders.
+            cmd.extend(codecs.preserve_quality_command(vcodec))
 
     if 'frame_rate' in targs:
         fps = str(targs['frame_rate'])
@@ -261,6 +378,12 @@ def transcode_video_command(track, output_file, targs):
         cmd.append("-sws_flags")
         cmd.append("{}".format(scale))
 
+    if 'threads' in targs:
+        # Useful when running multiple transcodes in parallel, to avoid
+        # having each encoder start a thread for every core.
+        cmd.append("-threads")
+        cmd.append(str(targs['threads']))
+
     cmd.append("{}".format(output_file))
 
     return cmd
@@ -282,11 +405,10 @@ def merge_videos_command(input_file, output, container=None):
         "-safe", "0",
         "-i", input_file,
         "-c", "copy",
-    ] + ([
-        "-f", container,
-    ] if container is not None else []) + [
-        output
     ]
+    if container is not None:
+        cmd.extend(["-f", container])
+    cmd.append(output)
 
     return cmd, input_file
 
@@ -347,26 +469,29 @@ def find_unsupported_subtitle_streams(metadata, target_container):
         for stream_metadata in metadata.get('streams', [])
         if (
             stream_metadata.get('codec_type') == 'subtitle' and
-            (
-                stream_metadata.get('codec_name') not in codecs.SubtitleCodec._value2member_map_ or
-                codecs.SubtitleCodec(stream_metadata.get('codec_name')).select_conversion_for_container(target_container) is None
-            )
+            _select_subtitle_conversion(stream_metadata.get('codec_name'), target_container) is None
         )
     ]
 
 
+def _select_subtitle_conversion(codec_name, target_container):
+    # Unknown codecs can't be converted to anything.
+    codec = codecs.find_subtitle_codec(codec_name)
+    if codec is None:
+        return None
+
+    return codec.select_conversion_for_container(target_container)
+
+
 def select_subtitle_conversions(metadata, target_container):
     if target_container is None:
         # No container specified = leave conversions up to ffmpeg
         return {}
 
     conversions = {
-        stream_metadata.get('index'): codecs.SubtitleCodec(stream_metadata.get('codec_name')).select_conversion_for_container(target_container)
+        stream_metadata.get('index'): _select_subtitle_conversion(stream_metadata.get('codec_name'), target_container)
         for stream_metadata in metadata.get('streams', [])
-        if (
-            stream_metadata.get('codec_type') == 'subtitle' and
-            stream_metadata.get('codec_name') in codecs.SubtitleCodec._value2member_map_
-        )
+        if stream_metadata.get('codec_type') == 'subtitle'
     }
     return {index: codec for index, codec in conversions.items() if codec is not None}
 
@@ -381,45 +506,14 @@ def adjust_stream_indexes_for_removals(indexed_map: Dict[int, Any], removed_inde
     assert set(indexed_map) & set(removed_indexes) == set()
     assert all(index >= 0 for index in set(indexed_map) | set(removed_indexes))
 
-    if len(indexed_map) == 0:
-        return {}
-
-    # We'll iterate over two sorted collections in paralled.
-    # The first one is the set of streams to be removed.
-    # The other is a set of buckets corresponding to intervals between streams
-    # from index_map. Initially the buckets are empty. As we go over the
-    # removed streams, each one is added to the bucket for interval it falls into.
-    removal_histogram = {index: 0 for index in sorted(indexed_map)}
-    histogram_iterator = (index for index in removal_histogram)
-    current_histogram_index = next(histogram_iterator)
-
-    done = False
-    for removed_index in sorted(removed_indexes):
-        while current_histogram_index < removed_index:
-            try:
-                current_histogram_index = next(histogram_iterator)
-            except StopIteration:
-                done = True
-                break
-
-        if done:
-            break
-
-        removal_histogram[current_histogram_index] += 1
-
-    # Now we go over each stream in indexed_map and decrease its index by the total
-    # number of removed streams below it. We get that running total by summing
-    # the buckets as we go.
-    reindexed_map: Dict[int, Any] = {}
-    running_total = 0
-    for index, value in indexed_map.items():
-        running_total += removal_histogram[index]
-        assert running_total <= index
-        assert index - running_total not in reindexed_map
-
-        reindexed_map[index - running_total] = value
-
-    return reindexed_map
+    # Each stream's index goes down by the number of removed streams below it.
+    # Since the two sets are disjoint, that's just the insertion point of
+    # the stream's index in the sorted list of removed indexes.
+    sorted_removed_indexes = sorted(removed_indexes)
+    return {
+        index - bisect.bisect_left(sorted_removed_indexes, index): value
+        for index, value in indexed_map.items()
+    }
 
 
 def shift_stream_indexes(indexed_map: Dict[int, Any], shift: int) -> Dict[int, Any]:
@@ -460,6 +554,9 @@ def replace_streams_command(input_file,
                 Transcoding different audio streams differently is currently
                 not supported.
                 Can include the following keys:`bitrate`, `codec`.
+            - `threads`: number of threads ffmpeg may use. Only has an
+                effect when audio is being re-encoded, i.e. when `codec`
+                is specified. Otherwise all streams are just copied.
     :param container: Container type to use for the output file.
         Optional, but highly recommended. If you don't specify it, ffmpeg will
         try to guess based the extension of the output file and also we won't
@@ -516,21 +613,11 @@ def replace_streams_command(input_file,
     else:
         data_streams_to_strip = []
 
-    data_map_options = [
-        ["-map", f"-0:{index}"]
-        for index in data_streams_to_strip
-    ]
-
     if strip_unsupported_subtitle_streams:
         subtitle_streams_to_strip = find_unsupported_subtitle_streams(input_metadata, container)
     else:
         subtitle_streams_to_strip = []
 
-    subtitle_map_options = [
-        ["-map", f"-0:{index}"]
-        for index in subtitle_streams_to_strip
-    ]
-
     subtitle_codec_map = shift_stream_indexes(
         adjust_stream_indexes_for_removals(
             select_subtitle_conversions(input_metadata, container),
@@ -540,10 +627,6 @@ def replace_streams_command(input_file,
         ),
         meta.count_streams(replacement_metadata, VALID_STREAM_TYPES[stream_type]),
     )
-    subtitle_codec_options = [
-        [f"-codec:{index}", codec]
-        for index, codec in subtitle_codec_map.items()
-    ]
 
     cmd = [
         FFMPEG_COMMAND,
@@ -553,29 +636,39 @@ def replace_streams_command(input_file,
         "-map", f"1:{stream_type}",
         "-map", "0",
         "-map", f"-0:{stream_type}",
-    ] + flatten_list(data_map_options) + [
-    ] + flatten_list(subtitle_map_options) + [
-    ] + flatten_list(subtitle_codec_options) + [
+    ]
+    for index in data_streams_to_strip:
+        cmd.extend(["-map", f"-0:{index}"])
+    for index in subtitle_streams_to_strip:
+        cmd.extend(["-map", f"-0:{index}"])
+    for index, codec in subtitle_codec_map.items():
+        cmd.extend([f"-codec:{index}", codec])
+    cmd.extend([
         "-copy_unknown",
         "-c:v", "copy",
         "-c:d", "copy",
-    ] + ([
-        "-f", container,
-    ] if container is not None else []) + ([
-        "-c:a", codecs.get_audio_encoder(targs['audio']['codec']),
-    ] if 'codec' in targs.get('audio', {}) else []) + ([
-        "-b:a", targs['audio']['bitrate'],
-    ] if 'bitrate' in targs.get('audio', {}) else []) + [
-        output_file,
-    ]
+    ])
+    if container is not None:
+        cmd.extend(["-f", container])
+    if 'codec' in targs.get('audio', {}):
+        cmd.extend(["-c:a", codecs.get_audio_encoder(targs['audio']['codec'])])
+    if 'bitrate' in targs.get('audio', {}):
+        cmd.extend(["-b:a", targs['audio']['bitrate']])
+    if 'threads' in targs and 'codec' in targs.get('audio', {}):
+        cmd.extend(["-threads", str(targs['threads'])])
+    cmd.append(output_file)
 
     return cmd
 
 
+# The metric commands use -nostats because per-frame progress would only be
+# more stderr lines for filter_metrics() to scan. The per-frame values go
+# to the frames files and the summary is still printed.
 def compute_psnr_command(video, reference_video, psnr_frames_file):
     cmd = [
         FFMPEG_COMMAND,
         "-nostdin",
+        "-nostats",
         "-i", video,
         "-i", reference_video,
         "-lavfi",
@@ -590,6 +683,7 @@ def compute_ssim_command(video, reference_video, ssim_frames_file):
     cmd = [
         FFMPEG_COMMAND,
         "-nostdin",
+        "-nostats",
         "-i", video,
         "-i", reference_video,
         "-lavfi",
@@ -600,6 +694,26 @@ def compute_ssim_command(video, reference_video, ssim_frames_file):
     return cmd
 
 
+def compute_psnr_and_ssim_command(video, reference_video, psnr_frames_file, ssim_frames_file):
+    # Both metrics are computed in a single pass so that the videos are
+    # decoded only once.
+    cmd = [
+        FFMPEG_COMMAND,
+        "-nostdin",
+        "-nostats",
+        "-i", video,
+        "-i", reference_video,
+        "-lavfi",
+        "[0:v]split=2[video_psnr][video_ssim];"
+        "[1:v]split=2[reference_psnr][reference_ssim];"
+        "[video_psnr][reference_psnr]psnr=" + psnr_frames_file + ";"
+        "[video_ssim][reference_ssim]ssim=" + ssim_frames_file,
+        "-f", "null", "-"
+    ]
+
+    return cmd
+
+
 def get_metadata_command(video):
     cmd = [
         FFPROBE_COMMAND,
@@ -613,49 +727,196 @@ def get_metadata_command(video):
     return cmd
 
 
+def get_video_len_command(input_file):
+    cmd = [
+        FFPROBE_COMMAND,
+        "-v", "quiet",
+        "-show_entries", "format=duration",
+        "-print_format", "default=noprint_wrappers=1:nokey=1",
+        input_file
+    ]
+
+    return cmd
+
+
 def get_video_len(input_file):
+    # Don't probe the file again if we already have its metadata.
+    cache_key = _get_metadata_cache_key(input_file)
+    if cache_key is not None:
+        metadata_str = _find_cached_metadata_str(cache_key)
+        if metadata_str is not None:
+            return meta.get_duration(json.loads(metadata_str))
+
+    # Otherwise ask only for the duration. Full metadata includes all the
+    # streams and can be much bigger.
+    duration = exec_cmd_to_string(get_video_len_command(input_file)).strip()
+    if duration not in ('', 'N/A'):
+        return float(duration)
+
+    # Fall back to full metadata to get the same error we'd get if the
+    # duration really is not available.
     metadata = get_metadata_json(input_file)
     return meta.get_duration(metadata)
 
 
-def filter_metric(cmd, regex, log_file):
-    psnr = exec_cmd_to_string(cmd).splitlines()
-    psnr = [line for line in psnr if re.search(regex, line)]
+def filter_metrics(cmd, regexes, log_files):
+    """
+    Runs the command and sorts lines of its output matching each of the
+    regexes into the corresponding log file. Returns the lists of matching
+    lines, one for each regex.
+    """
+    assert len(regexes) == len(log_files)
+
+    logger.debug("Executing command: %s", cmd)
+
+    # Regexes can be strings or compiled patterns. re.compile() returns the
+    # latter unchanged.
+    patterns = [re.compile(regex) for regex in regexes]
+
+    # Filter the output while the command is still running instead of
+    # buffering all of it first. It can get long for long videos.
+    # ffmpeg prints filter results to stderr. Nothing useful goes to stdout
+    # when the output is discarded with the null muxer.
+    matching_lines: List[List[str]] = [[] for _ in patterns]
+    with contextlib.ExitStack() as stack:
+        result_files = [stack.enter_context(open(log_file, "w", encoding='utf-8')) for log_file in log_files]
+        # stderr also contains metadata tags of the input files, which can be
+        # in any encoding. Don't let them break the metric computation.
+        with subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            encoding='utf-8',
+            errors='replace',
+        ) as process:
+            for line in process.stderr:
+                line = line.rstrip('\r\n')
+                for pattern, result_file, lines in zip(patterns, result_files, matching_lines):
+                    if pattern.search(line):
+                        result_file.write(line + "\n")
+                        lines.append(line)
+
+    if process.returncode != 0:
+        raise exceptions.CommandFailed(cmd, process.returncode)
+
+    return matching_lines
 
-    with open(log_file, "w") as result_file:
-        result_file.writelines(psnr)
 
-    return psnr
+def filter_metric(cmd, regex, log_file):
+    [matching_lines] = filter_metrics(cmd, [regex], [log_file])
+    return matching_lines
 
 
 def compute_psnr(video, reference_video, psnr_frames_file, psnr_log_file):
     cmd = compute_psnr_command(video, reference_video, psnr_frames_file)
-    psnr = filter_metric(cmd, r'PSNR', psnr_log_file)
+    psnr = filter_metric(cmd, _PSNR_REGEX, psnr_log_file)
 
     return psnr
 
 
 def compute_ssim(video, reference_video, ssim_frames_file, ssim_log_file):
     cmd = compute_ssim_command(video, reference_video, ssim_frames_file)
-    ssim = filter_metric(cmd, r'SSIM', ssim_log_file)
+    ssim = filter_metric(cmd, _SSIM_REGEX, ssim_log_file)
 
     return ssim
 
 
+def compute_psnr_and_ssim(video,
+                          reference_video,
+                          psnr_frames_file,
+                          ssim_frames_file,
+                          psnr_log_file,
+                          ssim_log_file):
+    cmd = compute_psnr_and_ssim_command(
+        video,
+        reference_video,
+        psnr_frames_file,
+        ssim_frames_file)
+    [psnr, ssim] = filter_metrics(
+        cmd,
+        [_PSNR_REGEX, _SSIM_REGEX],
+        [psnr_log_file, ssim_log_file])
+
+    return psnr, ssim
+
+
 def get_metadata(video, outputfile):
-    cmd = get_metadata_command(video)
-    exec_cmd_to_file(cmd, outputfile)
+    # Goes through the metadata cache so that saving the metadata and then
+    # reading it again with get_metadata_json() runs ffprobe only once.
+    metadata_str = get_metadata_str(video)
+
+    _create_parent_directory(outputfile)
+    with open(outputfile, "w") as result_file:
+        result_file.write(metadata_str)
+
+
+def _get_metadata_cache_key(video):
+    try:
+        video_stat = os.stat(video)
+    except OSError:
+        # Nothing to cache. Let ffprobe report the problem.
+        return None
+
+    # Size and modification time are a part of the key so that the file gets
+    # probed again if it changes.
+    return (os.path.abspath(video), video_stat.st_size, video_stat.st_mtime_ns)
+
+
+def _find_cached_metadata_str(cache_key):
+    with _metadata_cache_lock:
+        metadata_str = _metadata_cache.get(cache_key)
+        if metadata_str is not None:
+            _metadata_cache.move_to_end(cache_key)
+    return metadata_str
+
+
+def _cache_metadata_str(cache_key, metadata_str):
+    with _metadata_cache_lock:
+        _metadata_cache[cache_key] = metadata_str
+        _metadata_cache.move_to_end(cache_key)
+        while len(_metadata_cache) > _METADATA_CACHE_SIZE:
+            _metadata_cache.popitem(last=False)
 
 
 def get_metadata_str(video):
+    cache_key = _get_metadata_cache_key(video)
+    if cache_key is not None:
+        metadata_str = _find_cached_metadata_str(cache_key)
+        if metadata_str is not None:
+            return metadata_str
+
     cmd = get_metadata_command(video)
-    return exec_cmd_to_string(cmd)
+    metadata_str = exec_cmd_to_string(cmd)
+
+    if cache_key is not None:
+        _cache_metadata_str(cache_key, metadata_str)
+    return metadata_str
 
 
 def get_metadata_json(video):
-    cmd = get_metadata_command(video)
-    metadata_str = exec_cmd_to_string(cmd)
-    return json.loads(metadata_str)
+    # The cache stores ffprobe output rather than the parsed dict so that
+    # each caller gets its own copy that it's free to modify.
+    return json.loads(get_metadata_str(video))
+
+
+def get_metadata_json_many(videos, max_workers=None):
+    """
+    Same as get_metadata_json() but for multiple files at once, e.g. segments
+    produced by split(). ffprobe processes are run in parallel.
+    Results are returned in the same order as the input files.
+
+    :param max_workers: Maximum number of ffprobe processes running at the
+        same time. Defaults to the number of CPUs.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_get_worker_count(max_workers)) as executor:
+        return list(executor.map(get_metadata_json, videos))
+
+
+@functools.lru_cache(maxsize=None)
+def _exec_query_cmd_to_string(cmd: Tuple[str, ...]) -> str:
+    # Information about muxers and encoders built into ffmpeg does not change
+    # while we're running so there's no need to ask more than once.
+    return exec_cmd_to_string(list(cmd))
 
 
 def get_query_muxer_info_command(muxer: str) -> List[str]:
@@ -668,29 +929,31 @@ def get_query_muxer_info_command(muxer: str) -> List[str]:
     return cmd
 
 
+# Sample of expected text passed to the regex:
+#
+# Muxer 3g2 [3GP2 (3GPP2 file format)]:
+#     Common extensions: 3g2.
+#     Default video codec: h263.
+#     Default audio codec: amr_nb.
+# matroska muxer AVOptions:
+_DEFAULT_AUDIO_CODEC_REGEX = re.compile(
+    r"""
+    ^\s*                        # Leading whitespace
+    Default\ ?audio\ ?codec:\ * # Label
+    (.*[^\s.]|)\s*              # Codec name
+    \.?                         # Optional dot at the end of the line
+    \s*$                        # Trailing whitespace
+    """,
+    re.X | re.MULTILINE
+)
+
+
 def _parse_default_audio_codec_out_of_muxer_info(muxer_info: str) -> List[str]:
     """
     Looks for audio codec in ffmpeg output.
     """
 
-    # Sample of expected text passed to the regex:
-    #
-    # Muxer 3g2 [3GP2 (3GPP2 file format)]:
-    #     Common extensions: 3g2.
-    #     Default video codec: h263.
-    #     Default audio codec: amr_nb.
-    # matroska muxer AVOptions:
-    return re.findall(
-        r"""
-        ^\s*                        # Leading whitespace
-        Default\ ?audio\ ?codec:\ * # Label
-        (.*[^\s.]|)\s*              # Codec name
-        \.?                         # Optional dot at the end of the line
-        \s*$                        # Trailing whitespace
-        """,
-        muxer_info,
-        re.X | re.MULTILINE
-    )
+    return _DEFAULT_AUDIO_CODEC_REGEX.findall(muxer_info)
 
 
 def query_muxer_info(muxer: str) -> Dict[str, Any]:
@@ -703,7 +966,7 @@ def query_muxer_info(muxer: str) -> Dict[str, Any]:
     """
 
     muxer_info_command = get_query_muxer_info_command(muxer)
-    muxer_info = exec_cmd_to_string(muxer_info_command)
+    muxer_info = _exec_query_cmd_to_string(tuple(muxer_info_command))
 
     audio_codecs = _parse_default_audio_codec_out_of_muxer_info(muxer_info)
 
@@ -729,6 +992,21 @@ def get_query_encoder_info_command(encoder: str) -> List[str]:
     ]
 
 
+# Sample of expected text passed to the regex:
+#
+# Threading capabilities: none
+# Supported sample rates: 44100 48000 32000 22050 24000 16000 11025
+# Supported sample formats: s32p fltp s16p
+_SUPPORTED_SAMPLE_RATES_REGEX = re.compile(
+    r"""
+    ^\s*                           # Leading whitespace
+    Supported\ ?sample\ ?rates:\ * # Label
+    (.*[^\s]|)\s*$                 # Sample rate list
+    """,
+    re.X | re.MULTILINE
+)
+
+
 def _parse_supported_sample_rates_out_of_encoder_info(codec_info):
     """
     Looks for supported sample rates in ffmpeg output.
@@ -737,29 +1015,16 @@ def _parse_supported_sample_rates_out_of_encoder_info(codec_info):
     - `sample_rates`: list of the sampling rates supported by the codec.
     """
 
-    # Sample of expected text passed to the regex:
-    #
-    # Threading capabilities: none
-    # Supported sample rates: 44100 48000 32000 22050 24000 16000 11025
-    # Supported sample formats: s32p fltp s16p
-    return re.findall(
-        r"""
-        ^\s*                           # Leading whitespace
-        Supported\ ?sample\ ?rates:\ * # Label
-        (.*[^\s]|)\s*$                 # Sample rate list
-        """,
-        codec_info,
-        re.X | re.MULTILINE
-    )
+    return _SUPPORTED_SAMPLE_RATES_REGEX.findall(codec_info)
 
 
 def query_encoder_info(encoder):
-    ffmpeg_output = exec_cmd_to_string(get_query_encoder_info_command(encoder))
+    ffmpeg_output = _exec_query_cmd_to_string(tuple(get_query_encoder_info_command(encoder)))
     matches = _parse_supported_sample_rates_out_of_encoder_info(ffmpeg_output)
 
     if len(matches) == 0:
         # We won't be able to validate target sample rate without this information
-        print(f"WARNING: ffmpeg does not provide information about sample rates for encoder '{encoder}'.", file=sys.stderr)
+        logger.warning("ffmpeg does not provide information about sample rates for encoder '%s'.", encoder)
         return {}
 
     if len(matches) >= 2:
@@ -42,8 +42,11 @@ class UnsupportedTargetVideoFormat(InvalidVideo):
 
 
 class UnsupportedVideoCodec(InvalidVideo):
-    def __init__(self, video_codec, video_format):
-        super().__init__(message="Unsupported video codec: {} for video format: {}".format(video_codec, video_format))
+    def __init__(self, video_codec, video_format=None):
+        if video_format is None:
+            super().__init__(message="Unsupported video codec: {}".format(video_codec))
+        else:
+            super().__init__(message="Unsupported video codec: {} for video format: {}".format(video_codec, video_format))
 
 
 class MissingVideoEncoder(InvalidVideo):
@@ -52,8 +55,11 @@ class MissingVideoEncoder(InvalidVideo):
 
 
 class UnsupportedAudioCodec(InvalidVideo):
-    def __init__(self, audio_codec, video_format):
-        super().__init__(message="Unsupported audio codec: {} for video format: {}".format(audio_codec, video_format))
+    def __init__(self, audio_codec, video_format=None):
+        if video_format is None:
+            super().__init__(message="Unsupported audio codec: {}".format(audio_codec))
+        else:
+            super().__init__(message="Unsupported audio codec: {} for video format: {}".format(audio_codec, video_format))
 
 
 class MissingAudioEncoder(InvalidVideo):
@@ -62,8 +68,11 @@ class MissingAudioEncoder(InvalidVideo):
 
 
 class UnsupportedSubtitleCodec(InvalidVideo):
-    def __init__(self, subtitle_codec, video_format):
-        super().__init__(message="Unsupported subtitle codec: {} for video format: {}".format(subtitle_codec, video_format))
+    def __init__(self, subtitle_codec, video_format=None):
+        if video_format is None:
+            super().__init__(message="Unsupported subtitle codec: {}".format(subtitle_codec))
+        else:
+            super().__init__(message="Unsupported subtitle codec: {} for video format: {}".format(subtitle_codec, video_format))
 
 
 class MissingVideoStream(InvalidVideo):
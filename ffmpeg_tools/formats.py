@@ -50,7 +50,7 @@ class Container(enum.Enum):
 
     @staticmethod
     def from_name(name: str) -> 'Container':
-        return Container(name.lower())
+        return Container(name.strip().lower())
 
     def get_supported_video_codecs(self) -> List[str]:
         if self in _EXCLUSIVE_DEMUXERS:
@@ -105,7 +105,7 @@ class Container(enum.Enum):
 
     @staticmethod
     def is_supported(vformat: str) -> bool:
-        return vformat in list_supported_formats()
+        return vformat in _CONTAINERS_BY_NAME
 
     @staticmethod
     def list_supported_formats() -> List[str]:
@@ -139,6 +139,11 @@ class Container(enum.Enum):
         return _SAFE_INTERMEDIATE_FORMATS[self].value
 
 
+# Lookup table mapping container names to enum members. Also serves as the
+# set of valid container names. See the equivalent tables in codecs.
+_CONTAINERS_BY_NAME = {container.value: container for container in Container}
+
+
 # This set containe demuxers that cannot be used as muxers in ffmpeg.
 _EXCLUSIVE_DEMUXERS = {
     Container.c_QUICK_TIME_DEMUXER,
@@ -440,10 +445,11 @@ def get_safe_intermediate_format_for_demuxer(demuxer: str) -> str:
 
 
 def list_supported_video_codecs(vformat: str) -> List[str]:
-    if vformat not in Container._value2member_map_:
+    container = _CONTAINERS_BY_NAME.get(vformat)
+    if container is None:
         return []
 
-    return Container(vformat).get_supported_video_codecs()
+    return container.get_supported_video_codecs()
 
 
 def is_supported_video_codec(vformat: str, codec: str) -> bool:
@@ -461,10 +467,11 @@ def _list_supported_video_codecs_for_exclusive_demuxer(demuxer: Container) -> Li
 
 
 def list_supported_audio_codecs(vformat: str) -> List[str]:
-    if vformat not in Container._value2member_map_:
+    container = _CONTAINERS_BY_NAME.get(vformat)
+    if container is None:
         return []
 
-    return Container(vformat).get_supported_audio_codecs()
+    return container.get_supported_audio_codecs()
 
 
 def is_supported_audio_codec(vformat: str, codec: str) -> bool:
@@ -482,10 +489,11 @@ def _list_supported_audio_codecs_for_exclusive_demuxer(demuxer: Container) -> Li
 
 
 def list_supported_subtitle_codecs(vformat: str) -> List[str]:
-    if vformat not in Container._value2member_map_:
+    container = _CONTAINERS_BY_NAME.get(vformat)
+    if container is None:
         return []
 
-    return Container(vformat).get_supported_subtitle_codecs()
+    return container.get_supported_subtitle_codecs()
 
 
 def is_supported_subtitle_codec(vformat: str, codec: str) -> bool:
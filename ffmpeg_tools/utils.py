@@ -1,10 +1,14 @@
-from typing import Optional, Set, Tuple, Union
+import bisect
+import math
+from typing import List, Optional, Set, Tuple, Union
 
 
 Subrange = Union[int, Tuple[Optional[int], Optional[int]]]
 
 
 class SparseRange:
+    __slots__ = ('_points', '_range_starts', '_range_ends')
+
     def __init__(self, subranges: Set[Subrange]):
         assert all(
             isinstance(subrange, int)
@@ -14,24 +18,31 @@ class SparseRange:
             for subrange in subranges
         )
 
-        self._points = {subrange for subrange in subranges if not isinstance(subrange, tuple)}
-        self._ranges = {subrange for subrange in subranges if isinstance(subrange, tuple)}
+        self._points = frozenset(subrange for subrange in subranges if not isinstance(subrange, tuple))
+
+        # Open ends are replaced with infinities and overlapping ranges are
+        # merged so that contains() can find the only candidate range with a
+        # binary search on the sorted start points.
+        finite_ranges = sorted(
+            (
+                subrange[0] if subrange[0] is not None else -math.inf,
+                subrange[1] if subrange[1] is not None else math.inf,
+            )
+            for subrange in subranges
+            if isinstance(subrange, tuple)
+        )
+        self._range_starts: List[Union[int, float]] = []
+        self._range_ends: List[Union[int, float]] = []
+        for start, end in finite_ranges:
+            if len(self._range_ends) > 0 and start <= self._range_ends[-1]:
+                self._range_ends[-1] = max(self._range_ends[-1], end)
+            else:
+                self._range_starts.append(start)
+                self._range_ends.append(end)
 
     def contains(self, value: int) -> bool:
         if value in self._points:
             return True
 
-        for range in self._ranges:
-            if range[0] == range[1] == None:
-                return True
-
-            finite_range = (
-                range[0] if range[0] is not None else min(value, range[1]),
-                range[1] if range[1] is not None else max(value, range[0]),
-            )
-            assert finite_range[0] <= finite_range[1]
-
-            if finite_range[0] <= value <= finite_range[1]:
-                return True
-
-        return False
+        index = bisect.bisect_right(self._range_starts, value) - 1
+        return index >= 0 and value <= self._range_ends[index]
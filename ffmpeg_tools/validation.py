@@ -85,6 +85,10 @@ def validate_transcoding_params(
     for src_video_codec in meta.get_codecs(src_metadata, 'video'):
         validate_video_codec_conversion(src_video_codec, dst_params["video"].get("codec"))
 
+    if dst_params["video"].get("hardware_encoder") is not None:
+        # Fails if the backend is unknown or has no encoder for the codec.
+        codecs.get_video_encoder(dst_params["video"]["codec"], dst_params["video"]["hardware_encoder"])
+
     # Validate audio codec. Audio codec can not be set and ffmpeg should
     # either remain with currently used codec or transcode using default behavior
     # if it is necessary.
@@ -331,7 +335,7 @@ def validate_audio_sample_rates(
         dest_audio_codec: str,
         dst_audio_encoder_info: Optional[Dict[str, Any]]) -> bool:
 
-    assert dest_audio_codec in codecs.AudioCodec._value2member_map_
+    assert codecs.is_valid_audio_codec(dest_audio_codec)
     assert codecs.AudioCodec(dest_audio_codec).get_encoder() is not None
 
     for src_sample_rate in meta.get_sample_rates(src_metadata):
@@ -3,19 +3,20 @@ from unittest import TestCase, mock
 from ffmpeg_tools import codecs
 from ffmpeg_tools import exceptions
 from ffmpeg_tools import formats
+from ffmpeg_tools import frame_rate
 from ffmpeg_tools import utils
 from ffmpeg_tools import validation
 
 
 class TestAudioCodec(TestCase):
     @mock.patch.dict('ffmpeg_tools.codecs._SUPPORTED_SAMPLE_RATES', {'aac': utils.SparseRange({48000})})
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'aac': None})
+    @mock.patch.object(codecs.AudioCodec.AAC, '_encoder', None)
     def test_is_supported_sample_rate_should_return_false_if_codec_does_not_have_encoder(self):
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(5000, None))
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(48000, None))
 
     @mock.patch.dict('ffmpeg_tools.codecs._SUPPORTED_SAMPLE_RATES', {'aac': utils.SparseRange({48000})})
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'aac': 'aac'})
+    @mock.patch.object(codecs.AudioCodec.AAC, '_encoder', 'aac')
     def test_is_supported_sample_rate_should_use_encoder_info_if_available(self):
         encoder_info = {'sample_rates': [5000, 48000]}
         self.assertTrue(codecs.AudioCodec.AAC.is_supported_sample_rate(5000, encoder_info))
@@ -23,27 +24,27 @@ class TestAudioCodec(TestCase):
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(6000, encoder_info))
 
     @mock.patch.dict('ffmpeg_tools.codecs._SUPPORTED_SAMPLE_RATES', {'aac': utils.SparseRange({48000})})
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'aac': 'aac'})
+    @mock.patch.object(codecs.AudioCodec.AAC, '_encoder', 'aac')
     def test_is_supported_sample_rate_should_use_hardcoded_rates_if_encoder_info_does_not_contain_rates(self):
         encoder_info = {}
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(5000, encoder_info))
         self.assertTrue(codecs.AudioCodec.AAC.is_supported_sample_rate(48000, encoder_info))
 
     @mock.patch.dict('ffmpeg_tools.codecs._SUPPORTED_SAMPLE_RATES', {'aac': utils.SparseRange({48000})})
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'aac': 'aac'})
+    @mock.patch.object(codecs.AudioCodec.AAC, '_encoder', 'aac')
     def test_is_supported_sample_rate_should_use_hardcoded_rates_if_encoder_info_not_available(self):
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(5000, None))
         self.assertTrue(codecs.AudioCodec.AAC.is_supported_sample_rate(48000, None))
 
     @mock.patch.dict('ffmpeg_tools.codecs._SUPPORTED_SAMPLE_RATES', {'aac': utils.SparseRange({48000})})
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'aac': 'aac'})
+    @mock.patch.object(codecs.AudioCodec.AAC, '_encoder', 'aac')
     def test_is_supported_sample_rate_should_not_use_hardcoded_rates_if_encoder_info_specifies_that_no_rates_are_supported(self):
         encoder_info = {'sample_rates': []}
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(5000, encoder_info))
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(48000, encoder_info))
 
     @mock.patch.dict('ffmpeg_tools.codecs._SUPPORTED_SAMPLE_RATES', clear=True)
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'aac': 'aac'})
+    @mock.patch.object(codecs.AudioCodec.AAC, '_encoder', 'aac')
     def test_is_supported_sample_rate_should_return_false_if_supported_sample_rates_cannot_be_determined(self):
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(5000, None))
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(48000, None))
@@ -52,7 +53,7 @@ class TestAudioCodec(TestCase):
         'a': utils.SparseRange({48000}),
         'aac': utils.SparseRange({5000}),
     })
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'aac': 'a'})
+    @mock.patch.object(codecs.AudioCodec.AAC, '_encoder', 'a')
     def test_is_supported_sample_rate_should_use_encoder_name_rather_than_codec_name(self):
         self.assertFalse(codecs.AudioCodec.AAC.is_supported_sample_rate(5000, None))
         self.assertTrue(codecs.AudioCodec.AAC.is_supported_sample_rate(48000, None))
@@ -70,16 +71,30 @@ class TestSubtitleCodec(TestCase):
 
         self.assertEqual(codecs.SubtitleCodec('subrip'), codecs.SubtitleCodec.SUBRIP)
 
-    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': ['subrip', 'ass', 'webvtt']})
+    def test_from_name_should_normalize_case_and_whitespace(self):
+        self.assertEqual(codecs.SubtitleCodec.from_name(' SubRip '), codecs.SubtitleCodec.SUBRIP)
+        self.assertEqual(codecs.VideoCodec.from_name('H264'), codecs.VideoCodec.H_264)
+        self.assertEqual(codecs.AudioCodec.from_name('AAC'), codecs.AudioCodec.AAC)
+
+    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': frozenset({'subrip', 'ass', 'webvtt'})})
     def test_get_supported_conversions(self):
         self.assertCountEqual(codecs.SubtitleCodec.SUBRIP.get_supported_conversions(), ['subrip', 'ass', 'webvtt'])
 
 
 class TestSupportedConversions(TestCase):
 
+    def test_conversion_tables_should_have_rows_for_all_codecs(self):
+        self.assertEqual(codecs._VIDEO_SUPPORTED_CONVERSIONS.keys(), codecs._VIDEO_CODECS_BY_NAME.keys())
+        self.assertEqual(codecs._AUDIO_SUPPORTED_CONVERSIONS.keys(), codecs._AUDIO_CODECS_BY_NAME.keys())
+        self.assertEqual(codecs._SUBTITLE_SUPPORTED_CONVERSIONS.keys(), codecs._SUBTITLE_CODECS_BY_NAME.keys())
+
     def test_list_video_conversion(self):
         assert len(codecs.list_supported_video_conversions("h264")) > 1
 
+    def test_list_video_conversion_should_be_sorted(self):
+        conversions = codecs.list_supported_video_conversions("h264")
+        self.assertEqual(list(conversions), sorted(conversions))
+
     def test_list_video_conversion_invalid_codec(self):
         assert len(codecs.list_supported_video_conversions("blabla")) == 0
 
@@ -89,40 +104,44 @@ class TestSupportedConversions(TestCase):
     def test_list_audio_conversion_invalid_codec(self):
         assert len(codecs.list_supported_audio_conversions("blabla")) == 0
 
-    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': ['subrip', 'ass', 'webvtt']})
+    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': frozenset({'subrip', 'ass', 'webvtt'})})
     def test_list_subtitle_conversion(self):
         assert len(codecs.list_supported_subtitle_conversions("subrip")) > 1
 
-    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': ['subrip', 'ass', 'webvtt']})
+    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': frozenset({'subrip', 'ass', 'webvtt'})})
     def test_list_subtitle_conversion_invalid_codec(self):
         assert len(codecs.list_supported_subtitle_conversions("blabla")) == 0
 
-    @mock.patch.dict('ffmpeg_tools.codecs._VIDEO_SUPPORTED_CONVERSIONS', {"h264": ["h264", "mjpeg", "vp9"]})
+    @mock.patch.dict('ffmpeg_tools.codecs._VIDEO_SUPPORTED_CONVERSIONS', {"h264": frozenset({"vp9", "h264", "mjpeg"})})
+    def test_list_video_conversion_should_follow_conversion_table(self):
+        self.assertEqual(codecs.list_supported_video_conversions("h264"), ("h264", "mjpeg", "vp9"))
+
+    @mock.patch.dict('ffmpeg_tools.codecs._VIDEO_SUPPORTED_CONVERSIONS', {"h264": frozenset({"h264", "mjpeg", "vp9"})})
     def test_can_convert_correct_video_codec(self):
         self.assertTrue(codecs.VideoCodec("h264").can_convert("h264"))
 
-    @mock.patch.dict('ffmpeg_tools.codecs._VIDEO_SUPPORTED_CONVERSIONS', {"h264": ["h264", "mjpeg", "vp9"]})
+    @mock.patch.dict('ffmpeg_tools.codecs._VIDEO_SUPPORTED_CONVERSIONS', {"h264": frozenset({"h264", "mjpeg", "vp9"})})
     def test_can_convert_unsupported_video_codec(self):
         self.assertFalse(codecs.VideoCodec("h264").can_convert("msmpeg4v2"))
 
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_SUPPORTED_CONVERSIONS', {"aac": ["aac", "mp3", "vorbis"]})
+    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_SUPPORTED_CONVERSIONS', {"aac": frozenset({"aac", "mp3", "vorbis"})})
     def test_can_convert_correct_audio_codec(self):
         self.assertTrue(codecs.AudioCodec("aac").can_convert("aac"))
 
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_SUPPORTED_CONVERSIONS', {"aac": ["aac", "mp3", "vorbis"]})
+    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_SUPPORTED_CONVERSIONS', {"aac": frozenset({"aac", "mp3", "vorbis"})})
     def test_can_convert_unsupported_audio_codec(self):
         self.assertFalse(codecs.AudioCodec("aac").can_convert("wmapro"))
 
-    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': ['subrip', 'ass', 'webvtt']})
+    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': frozenset({'subrip', 'ass', 'webvtt'})})
     def test_can_convert_correct_subtitle_codec(self):
         self.assertTrue(codecs.SubtitleCodec("subrip").can_convert("subrip"))
 
-    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': ['subrip', 'ass', 'webvtt']})
+    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': frozenset({'subrip', 'ass', 'webvtt'})})
     def test_can_convert_unsupported_subtitle_codec(self):
         self.assertFalse(codecs.SubtitleCodec("subrip").can_convert("mov_text"))
 
     @mock.patch.dict('ffmpeg_tools.formats._CONTAINER_SUPPORTED_CODECS', {"matroska": {'subtitlecodecs': ['subrip', 'ass']}})
-    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': ['subrip', 'ass', 'webvtt']})
+    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': frozenset({'subrip', 'ass', 'webvtt'})})
     def test_select_conversion_for_container(self):
         assert formats.is_supported(formats.Container.c_MOV.value)
 
@@ -132,7 +151,7 @@ class TestSupportedConversions(TestCase):
         )
 
     @mock.patch.dict('ffmpeg_tools.formats._CONTAINER_SUPPORTED_CODECS', {"mov": {'subtitlecodecs': ['mov_text']}})
-    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': ['subrip', 'ass', 'webvtt']})
+    @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {'subrip': frozenset({'subrip', 'ass', 'webvtt'})})
     def test_select_conversion_for_container_should_return_none_if_target_container_does_not_support_any_conversion_target(self):
         self.assertEqual(
             codecs.SubtitleCodec.SUBRIP.select_conversion_for_container(formats.Container.c_MOV.value),
@@ -148,6 +167,82 @@ class TestSupportedConversions(TestCase):
         )
 
 
+class TestVideoCodecAliases(TestCase):
+
+    def test_h265_should_share_table_entries_with_hevc(self):
+        self.assertEqual(codecs.get_video_encoder("h265"), codecs.get_video_encoder("hevc"))
+        self.assertEqual(codecs.list_supported_video_conversions("h265"), codecs.list_supported_video_conversions("hevc"))
+
+    def test_aliases_should_have_same_encoder_as_aliased_codec(self):
+        # Encoders are stored on the enum members so they can't share a table row.
+        for alias, codec in codecs._VIDEO_CODEC_ALIASES.items():
+            self.assertEqual(codecs.VideoCodec(alias).get_encoder(), codecs.VideoCodec(codec).get_encoder())
+
+    def test_preserve_quality_command_should_only_apply_to_h265(self):
+        self.assertTrue(codecs.preserve_quality_command("h265"))
+        self.assertFalse(codecs.preserve_quality_command("hevc"))
+
+
+class TestFromEncoder(TestCase):
+
+    def test_video_codec_from_encoder(self):
+        self.assertEqual(codecs.VideoCodec.from_encoder("libx264"), codecs.VideoCodec.H_264)
+
+    def test_video_codec_from_encoder_should_return_canonical_codec_for_aliases(self):
+        self.assertEqual(codecs.VideoCodec.from_encoder("libx265"), codecs.VideoCodec.HEVC)
+
+    def test_each_encoder_should_belong_to_a_single_codec(self):
+        # Otherwise from_encoder() could not tell which codec to return.
+        video_encoders = [
+            codec.get_encoder()
+            for codec in codecs.VideoCodec
+            if codec.get_encoder() is not None and codec.value not in codecs._VIDEO_CODEC_ALIASES
+        ]
+        audio_encoders = [codec.get_encoder() for codec in codecs.AudioCodec if codec.get_encoder() is not None]
+
+        self.assertEqual(len(video_encoders), len(set(video_encoders)))
+        self.assertEqual(len(audio_encoders), len(set(audio_encoders)))
+
+    def test_video_codec_from_unknown_encoder(self):
+        self.assertIsNone(codecs.VideoCodec.from_encoder("bla"))
+
+    def test_video_codec_from_encoder_should_round_trip(self):
+        for codec in codecs.VideoCodec:
+            if codec.get_encoder() is not None and codec != codecs.VideoCodec.H_265:
+                self.assertEqual(codecs.VideoCodec.from_encoder(codec.get_encoder()), codec)
+
+    def test_audio_codec_from_encoder(self):
+        self.assertEqual(codecs.AudioCodec.from_encoder("libmp3lame"), codecs.AudioCodec.MP3)
+
+    def test_audio_codec_from_unknown_encoder(self):
+        self.assertIsNone(codecs.AudioCodec.from_encoder("bla"))
+
+
+class TestIsValidCodec(TestCase):
+
+    def test_valid_video_codec(self):
+        self.assertTrue(codecs.is_valid_video_codec("h264"))
+
+    def test_invalid_video_codec(self):
+        self.assertFalse(codecs.is_valid_video_codec("bla"))
+
+    def test_valid_audio_codec(self):
+        self.assertTrue(codecs.is_valid_audio_codec("mp3"))
+
+    def test_invalid_audio_codec(self):
+        self.assertFalse(codecs.is_valid_audio_codec("bla"))
+
+    def test_valid_subtitle_codec(self):
+        self.assertTrue(codecs.is_valid_subtitle_codec("subrip"))
+
+    def test_invalid_subtitle_codec(self):
+        self.assertFalse(codecs.is_valid_subtitle_codec("bla"))
+
+    def test_find_subtitle_codec(self):
+        self.assertEqual(codecs.find_subtitle_codec("subrip"), codecs.SubtitleCodec.SUBRIP)
+        self.assertIsNone(codecs.find_subtitle_codec("bla"))
+
+
 class TestGettingEncoder(TestCase):
 
     def test_valid_video_codec(self):
@@ -157,6 +252,18 @@ class TestGettingEncoder(TestCase):
         with self.assertRaises(exceptions.UnsupportedVideoCodec):
             codecs.get_video_encoder("bla")
 
+    def test_hardware_video_encoder(self):
+        assert codecs.get_video_encoder("h264", "nvenc") == "h264_nvenc"
+        assert codecs.get_video_encoder("h265", "qsv") == "hevc_qsv"
+
+    def test_hardware_video_encoder_not_available_for_codec(self):
+        with self.assertRaises(exceptions.MissingVideoEncoder):
+            codecs.get_video_encoder("vp9", "nvenc")
+
+    def test_invalid_hardware_backend(self):
+        with self.assertRaises(exceptions.InvalidArgument):
+            codecs.get_video_encoder("h264", "bla")
+
     def test_valid_audio_codec(self):
         assert codecs.get_audio_encoder("mp3") == "libmp3lame"
 
@@ -166,6 +273,10 @@ class TestGettingEncoder(TestCase):
 
 
 class TestIsSupportedSampleRate(TestCase):
+    def test_all_audio_encoders_should_have_hardcoded_sample_rates(self):
+        encoders = {codec.get_encoder() for codec in codecs.AudioCodec} - {None}
+        self.assertEqual(encoders - set(codecs._SUPPORTED_SAMPLE_RATES), set())
+
     def test_is_supported_sample_rate_should_ask_audio_codec_if_codec_supported(self):
         with mock.patch.object(codecs.AudioCodec, 'is_supported_sample_rate', return_value=True):
             self.assertEqual(codecs.is_supported_sample_rate("aac", 5000, {}), True)
@@ -181,3 +292,15 @@ class TestIsSupportedSampleRate(TestCase):
 
         with mock.patch.object(codecs.AudioCodec, 'is_supported_sample_rate', return_value=False):
             self.assertEqual(codecs.is_supported_sample_rate("abcdef", 5000, {}), False)
+
+
+class TestFrameRateSubstitutions(TestCase):
+
+    def test_rules_should_be_normalized(self):
+        substitutions = codecs._normalize_frame_rate_substitutions({
+            'mpeg2video': {frame_rate.FrameRate(50, 4): frame_rate.FrameRate(24, 2)},
+        })
+
+        self.assertEqual(substitutions, {
+            'mpeg2video': {frame_rate.FrameRate(25, 2): frame_rate.FrameRate(12)},
+        })
@@ -1,5 +1,7 @@
 import copy
+import errno
 import os
+import sys
 import tempfile
 from unittest import TestCase, mock
 
@@ -90,6 +92,103 @@ class TestCommands(TestCase):
         self.assertEqual(command, expected_command)
 
 
+    def test_transcode_video_command_with_threads(self):
+        command = commands.transcode_video_command(
+            "input.mp4",
+            "output.mkv",
+            {'threads': 4},
+        )
+
+        expected_command = [
+            "ffmpeg",
+            "-nostdin",
+            "-i", "input.mp4",
+            "-threads", "4",
+            "output.mkv",
+        ]
+        self.assertEqual(command, expected_command)
+
+
+    def test_transcode_video_command_with_hardware_encoder(self):
+        command = commands.transcode_video_command(
+            "input.mp4",
+            "output.mkv",
+            {
+                'video': {
+                    'codec': 'h264',
+                    'hardware_encoder': 'nvenc',
+                },
+            },
+        )
+
+        expected_command = [
+            "ffmpeg",
+            "-nostdin",
+            "-i", "input.mp4",
+            "-c:v", "h264_nvenc",
+            "output.mkv",
+        ]
+        self.assertEqual(command, expected_command)
+
+
+    def test_transcode_video_command_should_reject_hardware_encoder_without_codec(self):
+        with self.assertRaises(exceptions.InvalidArgument):
+            commands.transcode_video_command(
+                "input.mp4",
+                "output.mkv",
+                {'video': {'hardware_encoder': 'nvenc'}},
+            )
+
+
+    def test_compute_psnr_and_ssim_command(self):
+        command = commands.compute_psnr_and_ssim_command(
+            "video.mp4",
+            "reference.mp4",
+            "psnr.log",
+            "ssim.log",
+        )
+
+        expected_command = [
+            "ffmpeg",
+            "-nostdin",
+            "-nostats",
+            "-i", "video.mp4",
+            "-i", "reference.mp4",
+            "-lavfi",
+            "[0:v]split=2[video_psnr][video_ssim];"
+            "[1:v]split=2[reference_psnr][reference_ssim];"
+            "[video_psnr][reference_psnr]psnr=psnr.log;"
+            "[video_ssim][reference_ssim]ssim=ssim.log",
+            "-f", "null", "-",
+        ]
+        self.assertEqual(command, expected_command)
+
+
+    def test_transcode_videos_should_transcode_each_track(self):
+        targs = {'video': {'codec': 'h264'}}
+
+        with mock.patch.object(commands, 'transcode_video') as mock_transcode_video:
+            commands.transcode_videos(['a.mp4', 'b.mp4'], targs, ['a.mkv', 'b.mkv'], max_workers=2)
+
+        self.assertCountEqual(mock_transcode_video.call_args_list, [
+            mock.call('a.mp4', targs, 'a.mkv'),
+            mock.call('b.mp4', targs, 'b.mkv'),
+        ])
+
+    def test_transcode_videos_should_raise_if_any_command_fails(self):
+        with mock.patch.object(commands, 'transcode_video', side_effect=[None, exceptions.CommandFailed(['ffmpeg'], 1)]):
+            with self.assertRaises(exceptions.CommandFailed):
+                commands.transcode_videos(['a.mp4', 'b.mp4'], {}, ['a.mkv', 'b.mkv'], max_workers=1)
+
+
+    def test_transcode_videos_should_reject_mismatched_outputs(self):
+        with mock.patch.object(commands, 'transcode_video') as mock_transcode_video:
+            with self.assertRaises(exceptions.InvalidArgument):
+                commands.transcode_videos(['a.mp4', 'b.mp4'], {}, ['a.mkv'])
+
+        mock_transcode_video.assert_not_called()
+
+
     def test_transcode_video_command_does_not_accept_audio_parameters(self):
         with self.assertRaises(exceptions.InvalidArgument):
             commands.transcode_video_command(
@@ -137,6 +236,44 @@ class TestCommands(TestCase):
         self.assertEqual(command, expected_command)
 
 
+    @parameterized.expand([
+        ({'codec': 'mp3'}, ["-c:a", "libmp3lame", "-threads", "2"]),
+        ({'bitrate': '128k'}, ["-b:a", "128k"]),
+    ])
+    @mock.patch('ffmpeg_tools.commands.get_metadata_json')
+    def test_replace_streams_command_passes_threads_only_when_reencoding_audio(
+            self,
+            audio_params,
+            expected_audio_options,
+            _mock_get_metadata_json):
+        command = commands.replace_streams_command(
+            get_absolute_resource_path('ForBiggerBlazes-[codec=h264].mp4'),
+            get_absolute_resource_path('ForBiggerBlazes-[codec=h264][video-only].mkv'),
+            get_absolute_resource_path('ForBiggerBlazes-[codec=h264].mkv'),
+            "v",
+            {
+                'audio': audio_params,
+                'threads': 2,
+            },
+        )
+
+        expected_command = [
+            "ffmpeg",
+            "-nostdin",
+            "-i", get_absolute_resource_path('ForBiggerBlazes-[codec=h264].mp4'),
+            "-i", get_absolute_resource_path('ForBiggerBlazes-[codec=h264][video-only].mkv'),
+            "-map", "1:v",
+            "-map", "0",
+            "-map", "-0:v",
+            "-copy_unknown",
+            "-c:v", "copy",
+            "-c:d", "copy",
+            *expected_audio_options,
+            get_absolute_resource_path('ForBiggerBlazes-[codec=h264].mkv'),
+        ]
+        self.assertEqual(command, expected_command)
+
+
     def test_replace_streams_command_validates_stream_type(self):
         with self.assertRaises(exceptions.InvalidArgument):
             commands.replace_streams_command(
@@ -319,7 +456,7 @@ class TestCommands(TestCase):
     @mock.patch('ffmpeg_tools.commands.meta.count_streams', return_value=1)          # number of video streams in the replacement file (will be added)
     @mock.patch('ffmpeg_tools.commands.meta.find_stream_indexes', return_value=[0])  # video streams from input file (will be removed)
     @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {
-        'subrip': ['subrip', 'ass', 'webvtt'],
+        'subrip': frozenset({'subrip', 'ass', 'webvtt'}),
     })
     def test_replace_streams_command_should_leave_converting_subtitles_up_to_ffmpeg_if_no_container_specified(
         self,
@@ -376,10 +513,10 @@ class TestUnsupportedStreamDetection(TestCase):
 
     @mock.patch.dict('ffmpeg_tools.formats._CONTAINER_SUPPORTED_CODECS', {"matroska": {'subtitlecodecs': ['mov_text']}})
     @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {
-        'subrip': ['subrip', 'ass', 'mov_text'],
-        'ass': ['ass', 'mov_text'],
-        'mov_text': ['mov_text'],
-        'webvtt': ['subrip', 'ass'],
+        'subrip': frozenset({'subrip', 'ass', 'mov_text'}),
+        'ass': frozenset({'ass', 'mov_text'}),
+        'mov_text': frozenset({'mov_text'}),
+        'webvtt': frozenset({'subrip', 'ass'}),
     })
     def test_find_unsupported_subtitle_streams_strips_streams_not_convertible_to_something_supported_by_target_container(self):
         self.assertCountEqual(
@@ -400,10 +537,10 @@ class TestUnsupportedStreamDetection(TestCase):
         "matroska": {'subtitlecodecs': ['subrip', 'ass', 'mov_text']}
     })
     @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {
-        'subrip': ['subrip', 'ass', 'webvtt'],
-        'ass': ['ass', 'mov_text'],
-        'mov_text': ['mov_text'],
-        'webvtt': ['subrip', 'webvtt'],
+        'subrip': frozenset({'subrip', 'ass', 'webvtt'}),
+        'ass': frozenset({'ass', 'mov_text'}),
+        'mov_text': frozenset({'mov_text'}),
+        'webvtt': frozenset({'subrip', 'webvtt'}),
     })
     def test_select_subtitle_conversions(self):
         suggested_conversions = commands.select_subtitle_conversions(self.METADATA_WITH_SUBTITLES, target_container='matroska')
@@ -420,10 +557,10 @@ class TestUnsupportedStreamDetection(TestCase):
         "matroska": {'subtitlecodecs': ['subrip', 'ass', 'mov_text']}
     })
     @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {
-        'subrip': ['subrip', 'ass', 'webvtt'],
-        'ass': ['ass', 'mov_text'],
-        'mov_text': ['mov_text'],
-        'webvtt': ['subrip', 'webvtt'],
+        'subrip': frozenset({'subrip', 'ass', 'webvtt'}),
+        'ass': frozenset({'ass', 'mov_text'}),
+        'mov_text': frozenset({'mov_text'}),
+        'webvtt': frozenset({'subrip', 'webvtt'}),
     })
     def test_select_subtitle_conversions_should_not_suggest_any_conversions_if_target_container_is_not_known(self):
         self.assertEqual(commands.select_subtitle_conversions(self.METADATA_WITH_SUBTITLES, target_container=None), {})
@@ -442,6 +579,20 @@ class TestUnsupportedStreamDetection(TestCase):
         }
         self.assertEqual(commands.adjust_stream_indexes_for_removals(indexed_map, removed_indexes), expected_result)
 
+    def test_adjust_stream_indexes_for_removals_should_not_depend_on_key_order(self):
+        indexed_map = {
+            9: 'C',
+            4: 'A',
+            7: 'B',
+        }
+        removed_indexes = [10, 1, 0, 5, 8]
+        expected_result = {
+            2: 'A',
+            4: 'B',
+            5: 'C',
+        }
+        self.assertEqual(commands.adjust_stream_indexes_for_removals(indexed_map, removed_indexes), expected_result)
+
     def test_adjust_stream_indexes_for_removals_should_handle_empty_collections(self):
         indexed_map = {
             4: None,
@@ -476,8 +627,290 @@ class TestUnsupportedStreamDetection(TestCase):
         self.assertEqual(commands.shift_stream_indexes(indexed_map, 0), indexed_map)
 
 
+class TestExecCmdToFile(TestCase):
+
+    def test_missing_directories_should_be_created(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'a', 'b', 'output.txt')
+
+            with mock.patch.object(commands, 'exec_cmd') as mock_exec_cmd:
+                commands.exec_cmd_to_file(['cmd'], file_path)
+                commands.exec_cmd_to_file(['cmd'], file_path)
+
+            self.assertTrue(os.path.isfile(file_path))
+            self.assertEqual(mock_exec_cmd.call_count, 2)
+
+    def test_file_in_current_directory_should_be_supported(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            original_dir = os.getcwd()
+            os.chdir(temp_dir)
+            try:
+                with mock.patch.object(commands, 'exec_cmd'):
+                    commands.exec_cmd_to_file(['cmd'], 'output.txt')
+
+                self.assertTrue(os.path.isfile('output.txt'))
+            finally:
+                os.chdir(original_dir)
+
+
+class TestStripSuffixFromSegmentsAndRenameFiles(TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.list_dir = temp_dir.name
+        self.list_file_path = os.path.join(self.list_dir, 'segment-list.txt')
+
+    def _create_files(self, file_names):
+        for file_name in file_names:
+            open(os.path.join(self.list_dir, file_name), 'w').close()
+
+    def test_segments_should_be_renamed_and_list_updated(self):
+        self._create_files(['video_0.mp4.mkv', 'video_1.mp4.mkv'])
+        with open(self.list_file_path, 'w') as list_file:
+            list_file.write('video_0.mp4.mkv\nvideo_1.mp4.mkv\n')
+
+        commands.strip_suffix_from_segments_and_rename_files(self.list_file_path, '.mkv')
+
+        with open(self.list_file_path) as list_file:
+            self.assertEqual(list_file.read(), 'video_0.mp4\nvideo_1.mp4')
+        self.assertEqual(
+            sorted(os.listdir(self.list_dir)),
+            ['segment-list.txt', 'video_0.mp4', 'video_1.mp4'],
+        )
+
+    def test_existing_files_should_not_be_overwritten(self):
+        self._create_files(['video_0.mp4.mkv'])
+        with open(os.path.join(self.list_dir, 'video_0.mp4'), 'w') as existing_file:
+            existing_file.write('existing')
+        with open(self.list_file_path, 'w') as list_file:
+            list_file.write('video_0.mp4.mkv\n')
+
+        with self.assertRaises(exceptions.FileAlreadyExists):
+            commands.strip_suffix_from_segments_and_rename_files(self.list_file_path, '.mkv')
+
+        with open(os.path.join(self.list_dir, 'video_0.mp4')) as existing_file:
+            self.assertEqual(existing_file.read(), 'existing')
+        self.assertTrue(os.path.isfile(os.path.join(self.list_dir, 'video_0.mp4.mkv')))
+
+    def test_interrupted_rename_should_be_completed(self):
+        self._create_files(['video_0.mp4.mkv'])
+        os.link(
+            os.path.join(self.list_dir, 'video_0.mp4.mkv'),
+            os.path.join(self.list_dir, 'video_0.mp4'),
+        )
+        with open(self.list_file_path, 'w') as list_file:
+            list_file.write('video_0.mp4.mkv\n')
+
+        commands.strip_suffix_from_segments_and_rename_files(self.list_file_path, '.mkv')
+
+        self.assertEqual(sorted(os.listdir(self.list_dir)), ['segment-list.txt', 'video_0.mp4'])
+
+    def test_rename_should_be_resumed_after_interruption(self):
+        # video_0 was renamed by an earlier attempt that did not get to update the list.
+        self._create_files(['video_0.mp4', 'video_1.mp4.mkv'])
+        with open(self.list_file_path, 'w') as list_file:
+            list_file.write('video_0.mp4.mkv\nvideo_1.mp4.mkv\n')
+
+        commands.strip_suffix_from_segments_and_rename_files(self.list_file_path, '.mkv')
+
+        with open(self.list_file_path) as list_file:
+            self.assertEqual(list_file.read(), 'video_0.mp4\nvideo_1.mp4')
+        self.assertEqual(
+            sorted(os.listdir(self.list_dir)),
+            ['segment-list.txt', 'video_0.mp4', 'video_1.mp4'],
+        )
+
+    def test_missing_segment_should_be_reported(self):
+        with open(self.list_file_path, 'w') as list_file:
+            list_file.write('video_0.mp4.mkv\n')
+
+        with self.assertRaises(FileNotFoundError):
+            commands.strip_suffix_from_segments_and_rename_files(self.list_file_path, '.mkv')
+
+    def test_rename_should_fall_back_if_hard_links_are_not_supported(self):
+        self._create_files(['video_0.mp4.mkv'])
+        with open(self.list_file_path, 'w') as list_file:
+            list_file.write('video_0.mp4.mkv\n')
+
+        with mock.patch('os.link', side_effect=PermissionError(errno.EPERM, 'Operation not permitted')):
+            commands.strip_suffix_from_segments_and_rename_files(self.list_file_path, '.mkv')
+
+        self.assertEqual(sorted(os.listdir(self.list_dir)), ['segment-list.txt', 'video_0.mp4'])
+
+    def test_missing_list_file_should_be_reported(self):
+        with self.assertRaises(FileNotFoundError) as context:
+            commands.strip_suffix_from_segments_and_rename_files(self.list_file_path, '.mkv')
+
+        self.assertEqual(context.exception.filename, self.list_file_path)
+        self.assertEqual(os.listdir(self.list_dir), [])
+
+    def test_list_should_be_left_intact_if_segment_name_is_invalid(self):
+        with open(self.list_file_path, 'w') as list_file:
+            list_file.write('video_0.mp4\n')
+
+        with self.assertRaises(exceptions.InvalidCommandOutput):
+            commands.strip_suffix_from_segments_and_rename_files(self.list_file_path, '.mkv')
+
+        with open(self.list_file_path) as list_file:
+            self.assertEqual(list_file.read(), 'video_0.mp4\n')
+        self.assertEqual(os.listdir(self.list_dir), ['segment-list.txt'])
+
+
+class TestMetadataCache(TestCase):
+
+    def setUp(self):
+        commands._metadata_cache.clear()
+        self.addCleanup(commands._metadata_cache.clear)
+
+        video_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+        video_file.close()
+        self.addCleanup(os.remove, video_file.name)
+        self.video_path = video_file.name
+
+    def test_metadata_should_be_cached_per_file(self):
+        with mock.patch.object(commands, 'exec_cmd_to_string', return_value='{"streams": []}') as mock_exec:
+            self.assertEqual(commands.get_metadata_json(self.video_path), {'streams': []})
+            self.assertEqual(commands.get_metadata_json(self.video_path), {'streams': []})
+            self.assertEqual(commands.get_metadata_str(self.video_path), '{"streams": []}')
+
+        self.assertEqual(mock_exec.call_count, 1)
+
+    def test_modified_file_should_be_probed_again(self):
+        with mock.patch.object(commands, 'exec_cmd_to_string', return_value='{}') as mock_exec:
+            commands.get_metadata_json(self.video_path)
+            with open(self.video_path, 'w') as video_file:
+                video_file.write('modified')
+            commands.get_metadata_json(self.video_path)
+
+        self.assertEqual(mock_exec.call_count, 2)
+
+    def test_cached_metadata_should_not_be_shared_between_callers(self):
+        with mock.patch.object(commands, 'exec_cmd_to_string', return_value='{"streams": []}'):
+            commands.get_metadata_json(self.video_path)['streams'].append({})
+            self.assertEqual(commands.get_metadata_json(self.video_path), {'streams': []})
+
+    def test_get_metadata_should_write_cached_metadata_to_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, 'metadata', 'metadata.json')
+
+            with mock.patch.object(commands, 'exec_cmd_to_string', return_value='{"streams": []}') as mock_exec:
+                commands.get_metadata(self.video_path, output_path)
+                self.assertEqual(commands.get_metadata_json(self.video_path), {'streams': []})
+
+            with open(output_path) as output_file:
+                self.assertEqual(output_file.read(), '{"streams": []}')
+
+        self.assertEqual(mock_exec.call_count, 1)
+
+    def test_missing_file_should_not_be_cached(self):
+        with mock.patch.object(commands, 'exec_cmd_to_string', return_value='{}') as mock_exec:
+            commands.get_metadata_json('nonexistent.mp4')
+            commands.get_metadata_json('nonexistent.mp4')
+
+        self.assertEqual(mock_exec.call_count, 2)
+
+    def test_get_video_len_should_use_cached_metadata(self):
+        with mock.patch.object(commands, 'exec_cmd_to_string', return_value='{"format": {"duration": "10.5"}}') as mock_exec:
+            commands.get_metadata_json(self.video_path)
+            self.assertEqual(commands.get_video_len(self.video_path), 10.5)
+
+        mock_exec.assert_called_once_with(commands.get_metadata_command(self.video_path))
+
+    def test_least_recently_used_metadata_should_be_evicted(self):
+        with mock.patch.object(commands, '_METADATA_CACHE_SIZE', 1), \
+                mock.patch.object(commands, 'exec_cmd_to_string', return_value='{}') as mock_exec:
+            commands.get_metadata_json(self.video_path)
+            commands.get_metadata_json(os.path.dirname(self.video_path))
+            commands.get_metadata_json(self.video_path)
+
+        self.assertEqual(mock_exec.call_count, 3)
+
+    def test_get_metadata_json_many_should_preserve_order(self):
+        with mock.patch.object(commands, 'get_metadata_json', side_effect=lambda video: {'video': video}):
+            metadata = commands.get_metadata_json_many(['a.mp4', 'b.mp4', 'c.mp4'], max_workers=2)
+
+        self.assertEqual(metadata, [{'video': 'a.mp4'}, {'video': 'b.mp4'}, {'video': 'c.mp4'}])
+
+
+class TestFilterMetrics(TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.psnr_log_path = os.path.join(temp_dir.name, 'psnr.log')
+        self.ssim_log_path = os.path.join(temp_dir.name, 'ssim.log')
+
+    @staticmethod
+    def _make_cmd(exit_code):
+        return [
+            sys.executable,
+            "-c",
+            f"import sys; sys.stderr.write('PSNR a\\nSSIM b\\nx\\nPSNR c\\n'); sys.exit({exit_code})",
+        ]
+
+    def test_matching_stderr_lines_should_be_sorted_into_log_files(self):
+        matching_lines = commands.filter_metrics(
+            self._make_cmd(0),
+            [commands._PSNR_REGEX, 'SSIM'],
+            [self.psnr_log_path, self.ssim_log_path],
+        )
+
+        self.assertEqual(matching_lines, [['PSNR a', 'PSNR c'], ['SSIM b']])
+        with open(self.psnr_log_path) as psnr_log_file:
+            self.assertEqual(psnr_log_file.read(), 'PSNR a\nPSNR c\n')
+        with open(self.ssim_log_path) as ssim_log_file:
+            self.assertEqual(ssim_log_file.read(), 'SSIM b\n')
+
+    def test_lines_that_are_not_valid_utf8_should_not_break_filtering(self):
+        cmd = [
+            sys.executable,
+            "-c",
+            "import sys; sys.stderr.buffer.write(b'  title : Caf\\xe9\\nPSNR y:1 Caf\\xe9\\n')",
+        ]
+
+        matching_lines = commands.filter_metric(cmd, commands._PSNR_REGEX, self.psnr_log_path)
+
+        self.assertEqual(matching_lines, ['PSNR y:1 Caf\ufffd'])
+        with open(self.psnr_log_path, encoding='utf-8') as psnr_log_file:
+            self.assertEqual(psnr_log_file.read(), 'PSNR y:1 Caf\ufffd\n')
+
+    def test_failed_command_should_raise(self):
+        with self.assertRaises(exceptions.CommandFailed):
+            commands.filter_metrics(
+                self._make_cmd(1),
+                [commands._PSNR_REGEX, commands._SSIM_REGEX],
+                [self.psnr_log_path, self.ssim_log_path],
+            )
+
+    def test_filter_metric_should_return_lines_for_single_regex(self):
+        matching_lines = commands.filter_metric(self._make_cmd(0), commands._SSIM_REGEX, self.ssim_log_path)
+
+        self.assertEqual(matching_lines, ['SSIM b'])
+
+
+class TestGetVideoLen(TestCase):
+
+    def test_duration_should_be_read_without_full_metadata(self):
+        with mock.patch.object(commands, 'exec_cmd_to_string', return_value='15.021667\n') as mock_exec, \
+                mock.patch.object(commands, 'get_metadata_json') as mock_get_metadata_json:
+            self.assertEqual(commands.get_video_len('video.mp4'), 15.021667)
+
+        mock_exec.assert_called_once_with(commands.get_video_len_command('video.mp4'))
+        mock_get_metadata_json.assert_not_called()
+
+    def test_should_fall_back_to_full_metadata_if_duration_not_available(self):
+        with mock.patch.object(commands, 'exec_cmd_to_string', return_value='N/A\n'), \
+                mock.patch.object(commands, 'get_metadata_json', return_value={'format': {'duration': '10.5'}}):
+            self.assertEqual(commands.get_video_len('video.mp4'), 10.5)
+
+
 class TestQueryMuxerInfo(TestCase):
 
+    def setUp(self):
+        commands._exec_query_cmd_to_string.cache_clear()
+        self.addCleanup(commands._exec_query_cmd_to_string.cache_clear)
+
     def test_function_should_return_valid_encoder(self):
         sample_ffmpeg_output = (
             'Muxer 3g2 [3GP2 (3GPP2 file format)]:\n'
@@ -571,8 +1004,23 @@ class TestQueryMuxerInfo(TestCase):
         result = commands._parse_default_audio_codec_out_of_muxer_info(text)
         self.assertEqual(result, expected_result)
 
+    def test_muxer_info_should_be_cached(self):
+        sample_ffmpeg_output = 'Default audio codec: amr_nb.'
+
+        with mock.patch.object(commands, 'exec_cmd_to_string', return_value=sample_ffmpeg_output) as mock_exec:
+            self.assertEqual(commands.query_muxer_info('3g2'), {'default_audio_codec': 'amr_nb'})
+            self.assertEqual(commands.query_muxer_info('3g2'), {'default_audio_codec': 'amr_nb'})
+            commands.query_muxer_info('mp4')
+
+        self.assertEqual(mock_exec.call_count, 2)
+
 
 class TestQueryEncoderInfo(TestCase):
+
+    def setUp(self):
+        commands._exec_query_cmd_to_string.cache_clear()
+        self.addCleanup(commands._exec_query_cmd_to_string.cache_clear)
+
     def test_should_return_sample_rates(self):
         sample_ffmpeg_output = (
             'Encoder libmp3lame [libmp3lame MP3 (MPEG audio layer 3)]:\n'
@@ -597,7 +1045,8 @@ class TestQueryEncoderInfo(TestCase):
         )
 
         with mock.patch.object(commands, 'exec_cmd_to_string', return_value=sample_ffmpeg_output):
-            encoder_info = commands.query_encoder_info('h264')
+            with self.assertLogs(commands.logger, 'WARNING'):
+                encoder_info = commands.query_encoder_info('h264')
 
         self.assertEqual(encoder_info, {})
 
@@ -79,6 +79,9 @@ class TestContainer(TestCase):
             demuxer.get_intermediate_muxer(),
             expected_intermediate_muxer.value)
 
+    def test_from_name_should_normalize_case_and_whitespace(self):
+        self.assertEqual(formats.Container.from_name(' Matroska '), formats.Container.c_MATROSKA)
+
 
 class TestSupportedFormats(object):
 
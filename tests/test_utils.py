@@ -42,6 +42,11 @@ class TestSparseRange(TestCase):
             ({1, 2, 3, (1, 3)}, 2, True),
             ({1, 2, 3, (1, 3)}, 3, True),
             ({1, 2, 3, (1, 3)}, 4, False),
+            ({(1, 10), (2, 3)}, 5, True),
+            ({(1, 10), (2, 3)}, 11, False),
+            ({(None, 5), (3, 8)}, 7, True),
+            ({(None, 5), (3, 8), (20, None)}, 10, False),
+            ({(None, 5), (3, 8), (20, None)}, 25, True),
         ],
         name_func=make_parameterized_test_name_generator_for_scalar_values(['subrange', 'value', 'result']),
     )
@@ -373,6 +373,24 @@ class TestConversionValidation(TestCase):
             validation.validate_transcoding_params(dst_params, metadata, {}, {})
 
 
+    def test_validate_transcoding_params_should_reject_unknown_hardware_encoder(self):
+        metadata = self.modify_metadata_with_passed_values("mp4", [1920, 1080], "h264", "mp3", 60)
+        dst_params = self.create_params("mp4", [640, 480], "h264", "mp3", 60)
+        dst_params['video']['hardware_encoder'] = 'no-such-backend'
+
+        with self.assertRaises(exceptions.InvalidArgument):
+            validation.validate_transcoding_params(dst_params, metadata, {}, {})
+
+
+    def test_validate_transcoding_params_should_reject_hardware_encoder_not_supporting_target_codec(self):
+        metadata = self.modify_metadata_with_passed_values("mp4", [1920, 1080], "h264", "mp3", 60)
+        dst_params = self.create_params("mp4", [640, 480], "mpeg4", "mp3", 60)
+        dst_params['video']['hardware_encoder'] = 'nvenc'
+
+        with self.assertRaises(exceptions.MissingVideoEncoder):
+            validation.validate_transcoding_params(dst_params, metadata, {}, {})
+
+
     @mock.patch.object(formats, 'is_supported_audio_codec', side_effect=(lambda vformat, codec: True))
     def test_target_audio_codec_supports_source_sample_rates(self, _mock_is_supported_audio_codec):
         metadata = self.modify_metadata_for_sample_rate_validation_tests("mp4", "h264", [
@@ -433,7 +451,7 @@ class TestConversionValidation(TestCase):
             self.assertTrue(validation.validate_transcoding_params(dst_params, metadata, dst_muxer_info, dst_audio_encoder_info))
 
 
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'aac': 'aac'})
+    @mock.patch.object(codecs.AudioCodec.AAC, '_encoder', 'aac')
     def test_validate_transcoding_params_should_fall_back_to_hardcoded_sample_rates_if_audio_encoder_info_not_available(self):
         metadata = self.modify_metadata_for_sample_rate_validation_tests("webm", "vp8", [
             ('opus', 5000),
@@ -448,7 +466,7 @@ class TestConversionValidation(TestCase):
                 validation.validate_transcoding_params(dst_params, metadata, {}, None)
 
 
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'opus': 'libopus'})
+    @mock.patch.object(codecs.AudioCodec.OPUS, '_encoder', 'libopus')
     @mock.patch.dict('ffmpeg_tools.codecs._SUPPORTED_SAMPLE_RATES', {'libopus': utils.SparseRange({8000})})
     def test_validate_transcoding_params_should_not_validate_sample_rate_if_target_audio_codec_cannot_be_determined(self):
         metadata = self.modify_metadata_for_sample_rate_validation_tests("webm", "vp8", [
@@ -814,8 +832,8 @@ class TestConversionValidation(TestCase):
         "mov": {'subtitlecodecs': ['mov_text'], 'videocodecs': ['h264'], 'audiocodecs': 'mp3'},
     })
     @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {
-        'subrip': ['subrip', 'mov_text', 'webvtt'],
-        'ass':    ['mov_text'],
+        'subrip': frozenset({'subrip', 'mov_text', 'webvtt'}),
+        'ass':    frozenset({'mov_text'}),
     })
     def test_validate_transcoding_params_should_accept_subtitles_if_they_can_be_converted_to_anything_supported_by_the_target_format(self):
         dst_params = self.create_params("mov", [1920, 1080], "h264", "mp3", 60)
@@ -842,8 +860,8 @@ class TestConversionValidation(TestCase):
         "mov": {'subtitlecodecs': ['mov_text'], 'videocodecs': ['h264'], 'audiocodecs': 'mp3'},
     })
     @mock.patch.dict('ffmpeg_tools.codecs._SUBTITLE_SUPPORTED_CONVERSIONS', {
-        'subrip': ['subrip', 'mov_text', 'webvtt'],
-        'ass':    [],
+        'subrip': frozenset({'subrip', 'mov_text', 'webvtt'}),
+        'ass':    frozenset(),
     })
     def test_validate_transcoding_params_should_reject_unstripped_subtitles_if_they_cannot_be_converted_to_anything_supported_by_the_target_format(self):
         dst_params = self.create_params("mov", [1920, 1080], "h264", "mp3", 60)
@@ -1028,7 +1046,7 @@ class TestValidateAudioSampleRates(TestCase):
         with self.assertRaises(exceptions.UnsupportedSampleRate):
             validation.validate_audio_sample_rates(metadata, 'mp3', dst_encoder_info)
 
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'mp3': 'libmp3lame'})
+    @mock.patch.object(codecs.AudioCodec.MP3, '_encoder', 'libmp3lame')
     def test_should_fall_back_to_hardcoded_rates_if_encoder_does_not_provide_information_about_sample_rates(self):
         metadata = {'streams': [
             {'index': 0, 'codec_type': 'audio', 'codec_name': 'mp3', 'sample_rate': 44100},
@@ -1041,7 +1059,7 @@ class TestValidateAudioSampleRates(TestCase):
             with self.assertRaises(exceptions.UnsupportedSampleRate):
                 validation.validate_audio_sample_rates(metadata, 'mp3', {})
 
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'mp3': 'libmp3lame'})
+    @mock.patch.object(codecs.AudioCodec.MP3, '_encoder', 'libmp3lame')
     def test_should_fall_back_to_hardcoded_rates_if_encoder_info_is_not_available_at_all(self):
         metadata = {'streams': [
             {'index': 0, 'codec_type': 'audio', 'codec_name': 'mp3', 'sample_rate': 44100},
@@ -1064,7 +1082,7 @@ class TestValidateAudioSampleRates(TestCase):
             validation.validate_audio_sample_rates(metadata, 'mp3', dst_encoder_info)
 
     @mock.patch.dict('ffmpeg_tools.codecs._SUPPORTED_SAMPLE_RATES', {})
-    @mock.patch.dict('ffmpeg_tools.codecs._AUDIO_ENCODERS', {'aac': 'aac'})
+    @mock.patch.object(codecs.AudioCodec.AAC, '_encoder', 'aac')
     def test_should_not_allow_files_with_unknown_sample_rate_even_if_supported_sample_rates_cannot_be_determined(self):
         metadata = {'streams': [
             {'index': 0, 'codec_type': 'audio', 'codec_name': 'aac'},